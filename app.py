@@ -1,6 +1,4 @@
 import os
-import re
-import shutil
 from pathlib import Path
 import streamlit as st
 
@@ -13,10 +11,33 @@ st.set_page_config(
 )
 
 # Importations après la config
+import importlib
+import sys
+import time
 from utils.auth import initialize_firebase, login_user, register_user, reset_password
 from utils.email import send_email
-from scripts.code3 import code3
-from scripts.code2 import code2
+from scripts.uploads import save_upload, upload_source
+from scripts.submission_store import adopt_upload, object_path, put_file, staging_path, start_collector
+from scripts.preflight import preflight_submission
+
+# Les modules d'analyse (code3 : modèles IA, lecture PDF, Firebase ; code2 :
+# matplotlib, Firebase) ne sont importés qu'à leur première utilisation :
+# la page de connexion s'affiche sans attendre ces imports lourds.
+# Coût des imports au démarrage : python -m scripts.import_report
+def _timed_import(module):
+    """Durée d'import affichée seulement au premier import du processus."""
+    first = module not in sys.modules
+    start = time.perf_counter()
+    imported = importlib.import_module(module)
+    if first:
+        print(f"⏱️ Import {module} : {time.perf_counter() - start:.2f} s")
+    return imported
+
+def code3(user_email, selected_file):
+    return _timed_import("scripts.code3").code3(user_email, selected_file)
+
+def code2(user_email):
+    return _timed_import("scripts.code2").code2(user_email)
 
 # ================== DESIGN & CSS ==================
 def local_css():
@@ -82,21 +103,42 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 DOCS_DIR = Path(os.getenv("DOCS_DIR", str(APP_ROOT / "documents")))
 DOCS_DIR.mkdir(parents=True, exist_ok=True)
 
-def _user_slug(email: str) -> str:
-    base = (email or "anonymous").split("@")[0]
-    return re.sub(r"[^a-zA-Z0-9_-]+", "_", base)
-
-def _user_workdir(email: str) -> Path:
-    slug = _user_slug(email)
-    d = DATA_DIR / "ben" / slug
-    d.mkdir(parents=True, exist_ok=True)
-    return d
+# Copies et corrigés sont rangés par contenu (scripts/submission_store.py) ;
+# la session ne garde que leurs sha256. Ménage périodique (TTL + quota) :
+start_collector()
+
+def _store_upload(uploaded, state_key):
+    """
+    Range un fichier déposé dans le magasin (copie par blocs, hash, comptage
+    des pages), une seule fois par fichier déposé. Retourne le StoredUpload.
+    """
+    upload = st.session_state.get(state_key)
+    upload_id = getattr(uploaded, "file_id", None) or (uploaded.name, uploaded.size)
+    if upload is None or st.session_state.get(f"{state_key}_id") != upload_id or not upload.path.exists():
+        upload = adopt_upload(save_upload(uploaded, staging_path(), name=uploaded.name))
+        st.session_state[state_key] = upload
+        st.session_state[f"{state_key}_id"] = upload_id
+    return upload
+
+def _preflight():
+    """
+    Pré-vérification de la copie contre le corrigé choisi (structure et premières
+    pages seulement, quelques millisecondes), mémorisée par couple de fichiers.
+    """
+    upload = st.session_state.get("student_upload")
+    prof_sha = st.session_state.get("prof_sha") if st.session_state.get("uploaded_prof") else None
+    key = (upload.sha256, prof_sha)
+    if st.session_state.get("preflight_key") != key:
+        st.session_state.preflight = preflight_submission(
+            upload_source(upload, st.session_state.get("stu_up")), object_path(prof_sha) if prof_sha else None)
+        st.session_state.preflight_key = key
+    return st.session_state.preflight
 
 # ================== PAGES ==================
 
 def show_auth_page():
-    initialize_firebase()
-    
+    # La connexion passe par l'API REST : Firebase Admin n'est initialisé
+    # que pour l'inscription (voir plus bas)
     # Centrage du formulaire de connexion avec des colonnes
     col1, col2, col3 = st.columns([1, 2, 1])
     
@@ -147,6 +189,7 @@ def show_auth_page():
                         st.warning("⚠️ Champs manquants")
                     else:
                         with st.spinner("Création du compte..."):
+                            initialize_firebase()
                             result = register_user(reg_email, reg_name)
                         if result.get("success"):
                             # Email logic (inchangé)
@@ -193,10 +236,6 @@ def show_file_and_execution_page(user_email: str):
     st.title("📂 Espace de Travail")
     st.markdown("---")
 
-    workdir = _user_workdir(user_email)
-    student_pdf_path = workdir / "Etudiant.pdf"
-    prof_pdf_path = workdir / "prof.pdf"
-
     # Layout en 2 colonnes pour UPLOAD vs SELECT
     col1, col2 = st.columns(2, gap="large")
 
@@ -206,10 +245,15 @@ def show_file_and_execution_page(user_email: str):
         uploaded_file = st.file_uploader("", type=["pdf"], key="stu_up")
         
         if uploaded_file is not None:
-            with open(student_pdf_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            st.success("✅ Fichier étudiant reçu")
-            st.session_state.uploaded_student = True
+            upload = _store_upload(uploaded_file, "student_upload")
+            if upload.is_pdf:
+                pages = f" ({upload.page_count_estimate} pages)" if upload.page_count_estimate else ""
+                st.success(f"✅ Fichier étudiant reçu{pages}")
+                st.session_state.student_sha = upload.sha256
+                st.session_state.uploaded_student = True
+            else:
+                st.error("❌ Ce fichier n'est pas un PDF valide.")
+                st.session_state.uploaded_student = False
         else:
             st.info("En attente du fichier...")
 
@@ -225,7 +269,8 @@ def show_file_and_execution_page(user_email: str):
             if files:
                 selected_file = st.selectbox('Choisir un fichier disponible', files)
                 if st.button("Valider ce choix"):
-                    shutil.copy2(DOCS_DIR / selected_file, prof_pdf_path)
+                    # Corrigé rangé une seule fois dans le magasin (aucune copie par utilisateur)
+                    st.session_state.prof_sha = put_file(DOCS_DIR / selected_file)
                     st.success(f"✅ '{selected_file}' sélectionné")
                     st.session_state.selected_prof_file = selected_file
                     st.session_state.uploaded_prof = True
@@ -235,11 +280,14 @@ def show_file_and_execution_page(user_email: str):
         with tab_upload:
             uploaded_prof = st.file_uploader("Uploader un corrigé (PDF)", type=["pdf"], key="prof_up_new")
             if uploaded_prof is not None:
-                with open(prof_pdf_path, "wb") as f:
-                    f.write(uploaded_prof.getbuffer())
-                st.success("✅ Corrigé chargé manuellement")
-                st.session_state.selected_prof_file = "Upload manuel"
-                st.session_state.uploaded_prof = True
+                prof_upload = _store_upload(uploaded_prof, "prof_upload")
+                if prof_upload.is_pdf:
+                    st.session_state.prof_sha = prof_upload.sha256
+                    st.success("✅ Corrigé chargé manuellement")
+                    st.session_state.selected_prof_file = "Upload manuel"
+                    st.session_state.uploaded_prof = True
+                else:
+                    st.error("❌ Ce fichier n'est pas un PDF valide.")
 
     st.markdown("---")
 
@@ -258,9 +306,25 @@ def show_file_and_execution_page(user_email: str):
         # Logique pour activer/désactiver le bouton
         student_ok = st.session_state.get("uploaded_student", False)
         prof_ok = st.session_state.get("uploaded_prof", False)
-        
-        if st.button("✨ Lancer l'analyse IA", disabled=not(student_ok and prof_ok), use_container_width=True):
+
+        # Copie refusée (scannée, chiffrée, sans question, autre corrigé...)
+        # avant tout chargement de modèle
+        preflight_ok = True
+        if student_ok:
+            report = _preflight()
+            preflight_ok = report.ok
+            if report.keys:
+                keys = ", ".join(f"{k}({p})" for k, p in report.keys.items())
+                st.caption(f"📄 {report.page_count} pages · questions détectées : {keys}")
+            for error in report.errors:
+                st.error(f"❌ {error}")
+            for warning in report.warnings:
+                st.warning(f"⚠️ {warning}")
+
+        if st.button("✨ Lancer l'analyse IA", disabled=not(student_ok and prof_ok and preflight_ok), use_container_width=True):
             st.session_state.page = "analyse"
+            # Nouvelle analyse demandée : le résultat précédent n'est plus réaffiché
+            st.session_state.pop("grading_result", None)
             st.rerun()
         
         if not (student_ok and prof_ok):
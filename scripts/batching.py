@@ -0,0 +1,278 @@
+import os
+import queue
+import threading
+import time
+import weakref
+
+import numpy as np
+
+# ==============================================================================
+# MICRO-BATCHING DYNAMIQUE ENTRE REQUÊTES CONCURRENTES
+# ==============================================================================
+# Quand plusieurs sessions notent en même temps, chacune appelle les modèles
+# avec de petits lots. Le MicroBatcher regroupe les requêtes arrivées pendant
+# une courte fenêtre (MICROBATCH_MAX_WAIT_MS) en un seul appel au modèle, dans
+# la limite de MICROBATCH_MAX_BATCH éléments, puis rend à chaque appelant sa part.
+# Chaque modèle enveloppé a ses propres batchers : quand le registre décharge
+# le modèle (close(), ou simple perte de la dernière référence), le thread de
+# regroupement s'arrête et ne retient plus le modèle en mémoire.
+
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "1") not in ("0", "false", "no")
+MICROBATCH_MAX_BATCH = int(os.getenv("MICROBATCH_MAX_BATCH", "128"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "15"))
+
+
+# Fin du thread de regroupement
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ("items", "done", "result", "error", "queued_at")
+
+    def __init__(self, items):
+        self.items = items
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Regroupe les appels à `fn(liste) -> liste de même longueur` venant de
+    plusieurs threads. submit() est bloquant et rend les résultats de l'appelant.
+    """
+
+    def __init__(self, fn, max_batch_size=MICROBATCH_MAX_BATCH, max_wait_ms=MICROBATCH_MAX_WAIT_MS, name="",
+                 model=None):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.name = name
+        # Porte du modèle (scripts/inference.py) à qui signaler l'attente en file
+        self._gate = None
+        if model:
+            from scripts.inference import get_gate
+            self._gate = get_gate(model)
+        self._queue = queue.Queue()
+        self._pending = None  # requête lue mais qui ne tenait pas dans le lot précédent
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "requests": 0, "items": 0,
+                       "queue_wait_s": 0.0, "max_queue_wait_s": 0.0, "compute_s": 0.0}
+        self._closed = False
+        self._start_thread()
+        _live_batchers.add(self)
+
+    def _start_thread(self):
+        self._thread = threading.Thread(target=self._loop, name=f"microbatch-{self.name}", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Arrête le thread de regroupement et libère `fn` (et le modèle qu'elle utilise)."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+
+    def _restart_after_fork(self):
+        # Seul le thread qui appelle fork() survit dans l'enfant : file, verrous et
+        # thread de regroupement sont recréés (le parent était inactif au fork)
+        self._queue = queue.Queue()
+        self._pending = None
+        self._stats_lock = threading.Lock()
+        self._start_thread()
+
+    def submit(self, items):
+        items = list(items)
+        if not items:
+            return []
+        if self._closed:
+            raise RuntimeError(f"Micro-batcher {self.name} fermé (modèle déchargé)")
+        request = _Request(items)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self):
+        first = self._pending or self._queue.get()
+        self._pending = None
+        if first is _STOP:
+            return None, 0
+        batch, size = [first], len(first.items)
+        deadline = time.monotonic() + self.max_wait_s
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is _STOP or size + len(request.items) > self.max_batch_size:
+                # Ne tient pas : ouvrira le prochain lot
+                self._pending = request
+                break
+            batch.append(request)
+            size += len(request.items)
+        return batch, size
+
+    def _loop(self):
+        while True:
+            batch, size = self._collect()
+            if batch is None:
+                # Fermé : les requêtes arrivées entre-temps échouent au lieu d'attendre
+                self.fn = None
+                self._fail_pending(RuntimeError(f"Micro-batcher {self.name} fermé (modèle déchargé)"))
+                return
+            flat = [item for request in batch for item in request.items]
+            # Attente de chaque appelant : de submit() au départ de son lot
+            dispatched = time.perf_counter()
+            waits = [dispatched - request.queued_at for request in batch]
+            if self._gate is not None:
+                self._gate.record_queue_waits(waits)
+            try:
+                results = self.fn(flat)
+                start = 0
+                for request in batch:
+                    request.result = results[start:start + len(request.items)]
+                    start += len(request.items)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            compute = time.perf_counter() - dispatched
+            with self._stats_lock:
+                self._stats["batches"] += 1
+                self._stats["requests"] += len(batch)
+                self._stats["items"] += size
+                self._stats["queue_wait_s"] += sum(waits)
+                self._stats["max_queue_wait_s"] = max(self._stats["max_queue_wait_s"], max(waits))
+                self._stats["compute_s"] += compute
+            for request in batch:
+                request.done.set()
+
+    def _fail_pending(self, error):
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not _STOP:
+                request.error = error
+                request.done.set()
+
+    def report(self):
+        """
+        Remplissage des lots (taille moyenne, requêtes regroupées par lot, taux
+        de remplissage), attente en file par requête et calcul par lot.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"] or 1
+        return {
+            "batches": stats["batches"],
+            "requests": stats["requests"],
+            "items": stats["items"],
+            "mean_queue_wait_ms": 1000 * stats["queue_wait_s"] / (stats["requests"] or 1),
+            "max_queue_wait_ms": 1000 * stats["max_queue_wait_s"],
+            "mean_compute_ms": 1000 * stats["compute_s"] / batches,
+            "mean_batch_items": stats["items"] / batches,
+            "mean_requests_per_batch": stats["requests"] / batches,
+            "fill_ratio": stats["items"] / (batches * self.max_batch_size),
+            "queued": self._queue.qsize(),
+        }
+
+
+# ==============================================================================
+# ADAPTATEURS (mêmes interfaces que les modèles)
+# ==============================================================================
+
+# Batchers vivants du processus (pour les statistiques et le fork) ; un
+# batcher fermé disparaît de lui-même quand son thread se termine
+_live_batchers = weakref.WeakSet()
+
+
+def _reset_batchers_after_fork():
+    for batcher in list(_live_batchers):
+        if not batcher._closed:
+            batcher._restart_after_fork()
+
+
+# Processus forkés par scripts/launcher.py
+os.register_at_fork(after_in_child=_reset_batchers_after_fork)
+
+
+def batching_report():
+    """Statistiques de tous les micro-batchers actifs du processus."""
+    return {b.name: b.report() for b in list(_live_batchers) if not b._closed}
+
+
+def _close_batchers(batchers):
+    for batcher in list(batchers.values()):
+        batcher.close()
+
+
+class BatchedUseModel:
+    """use_model([textes]) regroupé avec les appels concurrents des autres sessions."""
+
+    def __init__(self, use_model, name="use"):
+        def embed(texts):
+            out = use_model(texts)
+            return np.asarray(out.numpy() if hasattr(out, "numpy") else out, dtype=np.float32)
+
+        self._batcher = MicroBatcher(embed, name=name, model=name)
+        # Enveloppe abandonnée sans close() : le batcher s'arrête quand même
+        weakref.finalize(self, self._batcher.close)
+
+    def __call__(self, texts):
+        return np.asarray(self._batcher.submit(texts), dtype=np.float32)
+
+    def close(self):
+        self._batcher.close()
+
+
+class BatchedZeroShot:
+    """zero_shot(phrases, labels, batch_size=...) regroupé par jeu de labels."""
+
+    def __init__(self, zero_shot, name="zero_shot"):
+        self.zero_shot = zero_shot
+        self.name = name
+        self._batchers = {}
+        self._lock = threading.Lock()
+        weakref.finalize(self, _close_batchers, self._batchers)
+
+    def _batcher(self, labels):
+        with self._lock:
+            if labels not in self._batchers:
+                # La fonction ne référence que le modèle, pas l'enveloppe (libérable)
+                zero_shot = self.zero_shot
+
+                def classify(seqs):
+                    from scripts.clarity import CLARITY_BATCH_SIZE
+
+                    results = zero_shot(seqs, list(labels), batch_size=CLARITY_BATCH_SIZE * len(labels))
+                    return [results] if isinstance(results, dict) else results
+
+                self._batchers[labels] = MicroBatcher(classify, name=f"{self.name}:{'|'.join(labels)}",
+                                                      model=self.name)
+            return self._batchers[labels]
+
+    def __call__(self, sequences, candidate_labels, batch_size=None):
+        batcher = self._batcher(tuple(candidate_labels))
+        if isinstance(sequences, str):
+            return batcher.submit([sequences])[0]
+        return batcher.submit(sequences)
+
+    def close(self):
+        _close_batchers(self._batchers)
+
+
+def with_micro_batching(name, model):
+    """Enveloppe un modèle chargé si le micro-batching est activé."""
+    if not MICROBATCH_ENABLED:
+        return model
+    if name == "use":
+        return BatchedUseModel(model)
+    if name == "zero_shot":
+        return BatchedZeroShot(model)
+    return model
@@ -0,0 +1,124 @@
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+from scripts.paths import DOCS_DIR
+
+# ==============================================================================
+# BANC D'ESSAI DU MATCHER DE LEXIQUES
+# ==============================================================================
+# Compare les anciens regex (un par concept et par auteur, compilés à chaque
+# appel) au matcher compilé de scripts/lexicon.py, sur le texte des corrigés de
+# documents/ et sur des lexiques grossis artificiellement jusqu'à plusieurs
+# milliers d'entrées. Vérifie au passage que les résultats sont identiques.
+#
+# Usage : python -m scripts.bench_lexicon [--sizes 1 10 40] [--repeat 5]
+
+# Facteurs de grossissement des lexiques (1 = lexiques réels)
+LEXICON_SCALES = (1, 10, 40)
+
+
+def legacy_find_management_concepts(text, concepts):
+    """Implémentation historique (référence de fidélité)."""
+    found_concepts = {concept: {'found': False, 'verbs': []} for concept in concepts.keys()}
+    for concept, verbs in concepts.items():
+        verb_forms = []
+        for verb in verbs:
+            verb_forms.extend([f"{verb}{ending}" for ending in ['', 'e', 'es', 'ons', 'ez', 'ent', 'ant']])
+        pattern_str = fr"\b(?:{'|'.join(verb_forms)})\w*\b|\b(?:l')?{re.escape(concept)}\b"
+        pattern = re.compile(pattern_str, re.IGNORECASE)
+        matches = pattern.findall(text)
+        if matches:
+            found_concepts[concept]['found'] = True
+            found_concepts[concept]['verbs'].extend(matches)
+    return found_concepts
+
+
+def legacy_find_management_authors(text, auteurs):
+    """Implémentation historique (référence de fidélité)."""
+    found_authors = {author: False for author in auteurs.keys()}
+    for author, variations in auteurs.items():
+        pattern = re.compile(fr"\b(?:{'|'.join(map(re.escape, variations))})\b", re.IGNORECASE)
+        if pattern.search(text):
+            found_authors[author] = True
+    return found_authors
+
+
+def grow_lexicons(concepts, auteurs, scale, seed=0):
+    """Lexiques `scale` fois plus grands : les vrais, plus des entrées inventées."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyzéè"
+    grown_c, grown_a = dict(concepts), dict(auteurs)
+    while len(grown_c) < scale * len(concepts):
+        stem = "".join(rng.choice(letters) for _ in range(rng.randint(5, 10)))
+        grown_c[f"{stem}ation"] = [stem, f"{stem}er"]
+    while len(grown_a) < scale * len(auteurs):
+        name = "".join(rng.choice(letters) for _ in range(rng.randint(4, 9))).capitalize()
+        grown_a[name] = [name]
+    return grown_c, grown_a
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def run_benchmark(scales=LEXICON_SCALES, repeat=5, docs_dir=DOCS_DIR):
+    from scripts.grading import extract_text_from_pdf, load_concepts_and_authors, split_into_questions
+    from scripts.lexicon import LexiconMatcher, match_lexicon
+
+    concepts, auteurs = load_concepts_and_authors()
+    texts = []
+    for pdf_path in sorted(Path(docs_dir).glob("*.pdf")):
+        texts.extend(q['text'] for q in split_into_questions(extract_text_from_pdf(pdf_path)).values())
+    chars = sum(len(t) for t in texts)
+
+    report = {}
+    for scale in scales:
+        c, a = grow_lexicons(concepts, auteurs, scale)
+
+        def legacy():
+            # Comme avant : deux appels par texte, un regex par entrée
+            return [(legacy_find_management_concepts(t, c), legacy_find_management_authors(t, a))
+                    for t in texts]
+
+        def compiled():
+            return [match_lexicon(t, c, a) for t in texts]
+
+        compile_s, _ = _time(lambda: LexiconMatcher(c, a), 1)
+        compiled()  # compilation hors mesure
+        legacy_s, expected = _time(legacy, repeat)
+        compiled_s, got = _time(compiled, repeat)
+        report[f"{len(c)}+{len(a)}"] = {
+            "legacy_ms": round(1000 * legacy_s, 2),
+            "compiled_ms": round(1000 * compiled_s, 2),
+            "compile_ms": round(1000 * compile_s, 2),
+            "speedup": round(legacy_s / compiled_s, 1) if compiled_s else None,
+            "identical": got == expected,
+        }
+    return {"texts": len(texts), "chars": chars, "lexicons": report}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc d'essai du matcher de lexiques")
+    parser.add_argument("--sizes", nargs="*", type=int, default=list(LEXICON_SCALES),
+                        help="Facteurs de grossissement des lexiques")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.repeat)
+    if args.json:
+        json.dump(report, sys.stdout, indent=1, ensure_ascii=False)
+    else:
+        print(f"{report['texts']} textes de questions, {report['chars']} caractères")
+        print(f"{'concepts+auteurs':<18}{'regex ms':>10}{'trie ms':>10}{'compil. ms':>12}{'gain':>7}  identique")
+        for size, r in report["lexicons"].items():
+            print(f"{size:<18}{r['legacy_ms']:>10}{r['compiled_ms']:>10}{r['compile_ms']:>12}"
+                  f"{r['speedup']:>7}  {'oui' if r['identical'] else 'NON'}")
@@ -0,0 +1,184 @@
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from scripts.paths import DOCS_DIR
+
+# ==============================================================================
+# BANC D'ESSAI DES MOTEURS D'EXTRACTION PDF
+# ==============================================================================
+# Pour chaque moteur installé (scripts/pdf_backends.py), extrait les corrigés
+# de documents/ et des copies synthétiques (générées ici, de 1 à 60 pages),
+# puis rapporte : pages/s, pic de mémoire résidente (échantillonné dans le processus de mesure,
+# un processus neuf par moteur) et fidélité (split_into_questions retrouve-t-il
+# les clés Q1(5) attendues : celles écrites dans les copies synthétiques, et
+# celles que trouve PyPDF2, le moteur historique, pour les corrigés ?).
+#
+# Usage : python -m scripts.bench_pdf [--backends pypdf2 pymupdf] [--repeat 3]
+
+SYNTHETIC_PAGES = (1, 5, 20, 60)
+_WORDS = ("la stratégie de l'entreprise repose sur une segmentation du marché et une "
+          "analyse concurrentielle selon Porter ainsi que sur la motivation des équipes "
+          "décrite par Maslow et la planification des ressources").split()
+
+
+def _pdf_string(text):
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return escaped.encode("cp1252", errors="replace")
+
+
+def write_synthetic_pdf(path, pages, seed=0):
+    """
+    Écrit un PDF texte de `pages` pages contenant des questions "Q<n>(<points>)"
+    suivies de réponses (générateur minimal, sans dépendance).
+    Retourne {clé: points} attendu.
+    """
+    rng = random.Random(seed)
+    expected, pages_lines, q = {}, [], 0
+    for _ in range(pages):
+        lines = []
+        for _ in range(2):
+            q += 1
+            points = rng.randint(2, 10)
+            expected[f"Q{q}"] = points
+            lines.append(f"Q{q}({points}) Réponse à la question {q}.")
+            for _ in range(18):
+                lines.append(" ".join(rng.choice(_WORDS) for _ in range(12)) + ".")
+        pages_lines.append(lines)
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    page_ids = []
+    for lines in pages_lines:
+        stream = b"BT /F1 9 Tf 11 TL 40 800 Td " + b" ".join(
+            b"(" + _pdf_string(line) + b") Tj T*" for line in lines) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    Path(path).write_bytes(bytes(out))
+    return expected
+
+
+def _question_keys(text):
+    from scripts.grading import split_into_questions
+    return {k: q["points"] for k, q in split_into_questions(text).items()}
+
+
+class _RssSampler:
+    """Pic de mémoire résidente (allocations C comprises) échantillonné toutes les 5 ms."""
+
+    def __init__(self):
+        from scripts.models import _current_rss_mb
+
+        self._rss = _current_rss_mb
+        self.peak_mb = self._rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(0.005):
+            self.peak_mb = max(self.peak_mb, self._rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self._rss())
+
+
+def _measure_backend(name, paths, repeat, queue):
+    """Processus neuf par moteur : le pic mémoire mesuré est le sien."""
+    from scripts.pdf_backends import get_backend
+
+    backend = get_backend(name)
+    # Import du moteur hors mesure (première ouverture)
+    backend.extract_pages(paths[0])
+    from scripts.models import _current_rss_mb
+    baseline_mb = _current_rss_mb()
+    pages = seconds = 0
+    keys = {}
+    with _RssSampler() as sampler:
+        for path in paths:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                page_texts = backend.extract_pages(path)
+                seconds += time.perf_counter() - start
+                pages += len(page_texts)
+            keys[path] = _question_keys("".join(page_texts))
+    queue.put({"pages": pages, "seconds": seconds,
+               "peak_mb": sampler.peak_mb - baseline_mb, "keys": keys})
+
+
+def run_benchmark(backends, repeat=3, docs_dir=DOCS_DIR):
+    from scripts.pdf_backends import available_backends
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_pdf_"))
+    paths = [str(p) for p in sorted(Path(docs_dir).glob("*.pdf"))]
+    expected = {}
+    for n in SYNTHETIC_PAGES:
+        path = workdir / f"synthetique_{n}p.pdf"
+        expected[str(path)] = write_synthetic_pdf(path, n, seed=n)
+        paths.append(str(path))
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for name in backends or available_backends():
+        queue = ctx.Queue()
+        process = ctx.Process(target=_measure_backend, args=(name, paths, repeat, queue))
+        process.start()
+        results[name] = queue.get()
+        process.join()
+
+    # Référence : clés connues pour les copies synthétiques, PyPDF2 pour les corrigés
+    reference = dict(results.get("pypdf2", next(iter(results.values())))["keys"])
+    reference.update(expected)
+    report = {}
+    for name, r in results.items():
+        differing = [Path(p).name for p in paths if r["keys"][p] != reference[p]]
+        report[name] = {
+            "pages_per_s": round(r["pages"] / r["seconds"], 1) if r["seconds"] else None,
+            "peak_mb": round(r["peak_mb"], 1),
+            "same_question_keys": not differing,
+            "differing_files": differing,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc d'essai des moteurs PDF")
+    parser.add_argument("--backends", nargs="*", help="Moteurs à comparer (défaut : tous les installés)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.backends, args.repeat)
+    if args.json:
+        json.dump(report, sys.stdout, indent=1, ensure_ascii=False)
+    else:
+        print(f"{'moteur':<12}{'pages/s':>10}{'pic Mo':>9}  mêmes clés Q")
+        for name, r in report.items():
+            same = "oui" if r["same_question_keys"] else f"NON ({', '.join(r['differing_files'])})"
+            print(f"{name:<12}{r['pages_per_s']:>10}{r['peak_mb']:>9}  {same}")
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from scripts.paths import DATA_DIR
+
+# ==============================================================================
+# CACHE À DEUX NIVEAUX DES SORTIES DE MODÈLES
+# ==============================================================================
+# Niveau 1 : LRU en mémoire limité en octets (partagé par les sessions Streamlit).
+# Niveau 2 : stockage disque, un fichier .npy par entrée, écrit atomiquement.
+# Clé : hash du texte normalisé + identifiant et version du modèle, de sorte
+# qu'un changement de modèle (ou de backend) n'utilise jamais d'anciennes valeurs.
+
+MODEL_CACHE_ENABLED = os.getenv("MODEL_CACHE_ENABLED", "1") not in ("0", "false", "no")
+# Budget mémoire de chaque cache (Mo)
+MODEL_CACHE_MEMORY_MB = float(os.getenv("MODEL_CACHE_MEMORY_MB", "256"))
+MODEL_CACHE_DIR = Path(os.getenv("MODEL_CACHE_DIR", DATA_DIR / "cache"))
+
+
+def normalize_text(text):
+    """Normalisation utilisée pour la clé : NFC, espaces compactés, bords retirés."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_key(text, model_id, version=""):
+    h = hashlib.sha256()
+    h.update(f"{model_id}\x00{version}\x00".encode("utf-8"))
+    h.update(normalize_text(text).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _nbytes(value):
+    return int(getattr(value, "nbytes", 8))
+
+
+class TieredCache:
+    """Cache LRU mémoire (budget en octets) adossé à un dossier disque. Thread-safe."""
+
+    def __init__(self, model_id, version="", memory_budget_bytes=None, disk_dir=None):
+        self.model_id = model_id
+        self.version = version
+        self.memory_budget_bytes = int(
+            MODEL_CACHE_MEMORY_MB * 1024 * 1024 if memory_budget_bytes is None else memory_budget_bytes
+        )
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def key(self, text):
+        return make_key(text, self.model_id, self.version)
+
+    # --- Niveau mémoire ---
+    def _remember(self, key, value):
+        size = _nbytes(value)
+        if size > self.memory_budget_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= _nbytes(old)
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.memory_budget_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _nbytes(evicted)
+                self.stats["evictions"] += 1
+
+    # --- Niveau disque ---
+    def _disk_path(self, key):
+        return self.disk_dir / key[:2] / f"{key}.npy"
+
+    def _read_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            return np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, value):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Écriture dans un fichier temporaire puis renommage : jamais de lecture partielle
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(value), allow_pickle=False)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    # --- API ---
+    def get(self, text):
+        key = self.key(text)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._entries[key]
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+        self._remember(key, value)
+        return value
+
+    def put(self, text, value):
+        key = self.key(text)
+        # Copie : une ligne d'un lot (vue) retiendrait toute la matrice du lot,
+        # bien au-delà des octets comptés dans le budget
+        value = np.array(value, copy=True)
+        self._remember(key, value)
+        self._write_disk(key, value)
+
+    def get_many(self, texts):
+        """Retourne {texte: valeur} pour les textes présents dans le cache."""
+        found = {}
+        for text in texts:
+            value = self.get(text)
+            if value is not None:
+                found[text] = value
+        return found
+
+    def put_many(self, items):
+        for text, value in items.items():
+            self.put(text, value)
+
+    def report(self):
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = lookups - self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name, model_id, version=""):
+    """Cache partagé par processus pour `name` (None si le cache est désactivé)."""
+    if not MODEL_CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None or (cache.model_id, cache.version) != (model_id, version):
+            cache = TieredCache(model_id, version, disk_dir=MODEL_CACHE_DIR / name)
+            _caches[name] = cache
+        return cache
+
+
+def cache_report():
+    """Statistiques de chaque cache du processus."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: cache.report() for name, cache in caches.items()}
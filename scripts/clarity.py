@@ -0,0 +1,106 @@
+import os
+
+# ==============================================================================
+# MOTEUR DE CLARTÉ GROUPÉ (zero-shot BART-large-MNLI)
+# ==============================================================================
+# Toutes les phrases de toutes les questions sont rassemblées, rangées par
+# tranches de longueur (pour limiter le padding), envoyées au pipeline par lots,
+# puis les scores sont redistribués question par question.
+
+# Moteur de clarté : "zero_shot" (BART) ou "distilled" (classifieur entraîné
+# par scripts/clarity_distill.py sur les embeddings USE)
+CLARITY_BACKEND = os.getenv("CLARITY_BACKEND", "zero_shot").lower()
+
+CLARITY_LABELS = ["claire", "confuse"]
+CLARITY_BATCH_SIZE = int(os.getenv("CLARITY_BATCH_SIZE", "16"))
+# Bornes (en mots) des tranches de longueur
+CLARITY_LENGTH_BUCKETS = tuple(
+    int(b) for b in os.getenv("CLARITY_LENGTH_BUCKETS", "8,16,32,64").split(",") if b.strip()
+)
+# Score neutre utilisé si le modèle échoue sur une phrase
+FALLBACK_SCORE = 0.5
+
+
+def _bucket_index(sentence, buckets=CLARITY_LENGTH_BUCKETS):
+    n_words = len(sentence.split())
+    for i, bound in enumerate(buckets):
+        if n_words <= bound:
+            return i
+    return len(buckets)
+
+
+def _clear_score(result):
+    return result["scores"][result["labels"].index("claire")]
+
+
+def _score_sentences(sentences, zero_shot, batch_size):
+    """Score d'une liste de phrases de longueur voisine, avec repli phrase par phrase."""
+    try:
+        results = zero_shot(sentences, CLARITY_LABELS, batch_size=batch_size)
+        if isinstance(results, dict):
+            results = [results]
+        return [_clear_score(r) for r in results]
+    except Exception:
+        scores = []
+        for sentence in sentences:
+            try:
+                scores.append(_clear_score(zero_shot(sentence, CLARITY_LABELS)))
+            except Exception:
+                scores.append(FALLBACK_SCORE)
+        return scores
+
+
+def score_clarity_batch(sentences_by_question, zero_shot, batch_size=CLARITY_BATCH_SIZE, cache=None):
+    """
+    Calcule le score "claire" de chaque phrase.
+
+    sentences_by_question : {q_key: [phrase, ...]}
+    Retourne {q_key: [score, ...]} dans l'ordre des phrases d'origine.
+    Si `cache` est fourni (scripts/cache.py), seules les phrases inconnues passent par le modèle.
+    """
+    # Chaque phrase distincte n'est évaluée qu'une fois
+    unique = list(dict.fromkeys(
+        s for sentences in sentences_by_question.values() for s in sentences
+    ))
+
+    scores = {}
+    if cache is not None:
+        scores = {s: float(v) for s, v in cache.get_many(unique).items()}
+
+    buckets = {}
+    for sentence in unique:
+        if sentence in scores:
+            continue
+        buckets.setdefault(_bucket_index(sentence), []).append(sentence)
+
+    for _, bucket in sorted(buckets.items()):
+        bucket.sort(key=len)
+        # batch_size compte des paires (phrase, hypothèse) : un lot = batch_size phrases
+        chunk = max(1, batch_size)
+        for start in range(0, len(bucket), chunk):
+            part = bucket[start:start + chunk]
+            for sentence, score in zip(part, _score_sentences(part, zero_shot, batch_size * len(CLARITY_LABELS))):
+                scores[sentence] = score
+                if cache is not None:
+                    cache.put(sentence, score)
+
+    return {
+        q_key: [scores[s] for s in sentences]
+        for q_key, sentences in sentences_by_question.items()
+    }
+
+
+def score_clarity_from_embeddings(embeddings_by_question, scorer):
+    """
+    Variante distillée : score de chaque phrase à partir des embeddings déjà
+    calculés ({q_key: matrice des phrases}). Retourne {q_key: [score, ...]}.
+    """
+    return {
+        q_key: scorer.score_embeddings(matrix)
+        for q_key, matrix in embeddings_by_question.items()
+    }
+
+
+def clarity_average(scores):
+    """Moyenne des scores de clarté d'une réponse (0.0 si aucune phrase)."""
+    return sum(scores) / len(scores) if scores else 0.0
@@ -0,0 +1,167 @@
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+from scripts.paths import DOCS_DIR, MODELS_DIR
+
+# ==============================================================================
+# CLASSIFIEUR DE CLARTÉ DISTILLÉ
+# ==============================================================================
+# Le modèle zero-shot (professeur) étiquette un corpus local de phrases, puis un
+# petit modèle scikit-learn (élève) apprend à reproduire son score "claire" à
+# partir des embeddings USE que la notation calcule déjà. Le grader peut ensuite
+# l'utiliser à la place de BART avec CLARITY_BACKEND=distilled.
+#
+# Usage :
+#   python -m scripts.clarity_distill train [--corpus phrases.txt ...] [--pdf doc.pdf ...]
+
+CLARITY_MODELS_DIR = MODELS_DIR / "clarity"
+ARTIFACT_PATTERN = re.compile(r"^clarity-v(\d+)\.joblib$")
+# Bornes pour le passage en logit (évite log(0))
+_EPS = 1e-4
+
+
+def _logit(p):
+    p = np.clip(np.asarray(p, dtype=np.float64), _EPS, 1 - _EPS)
+    return np.log(p / (1 - p))
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class DistilledClarityScorer:
+    """Prédit le score "claire" d'une phrase à partir de son embedding normalisé."""
+
+    def __init__(self, model, metadata):
+        self.model = model
+        self.metadata = metadata
+        self.version = metadata.get("version")
+
+    def score_embeddings(self, sentence_matrix):
+        if len(sentence_matrix) == 0:
+            return []
+        return [float(s) for s in _sigmoid(self.model.predict(sentence_matrix))]
+
+
+def list_versions(models_dir=CLARITY_MODELS_DIR):
+    if not models_dir.exists():
+        return []
+    versions = []
+    for path in models_dir.iterdir():
+        m = ARTIFACT_PATTERN.match(path.name)
+        if m:
+            versions.append(int(m.group(1)))
+    return sorted(versions)
+
+
+def load_distilled_scorer(version=None, models_dir=CLARITY_MODELS_DIR):
+    """Charge l'artefact `version` (ou le plus récent si None)."""
+    import joblib
+
+    versions = list_versions(models_dir)
+    if not versions:
+        raise FileNotFoundError(
+            f"Aucun classifieur de clarté dans {models_dir}. "
+            "Lancez `python -m scripts.clarity_distill train`."
+        )
+    version = int(version) if version else versions[-1]
+    artifact = models_dir / f"clarity-v{version}.joblib"
+    if not artifact.exists():
+        raise FileNotFoundError(f"Classifieur de clarté v{version} introuvable : {artifact}")
+    with open(artifact.with_suffix(".json"), "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    return DistilledClarityScorer(joblib.load(artifact), metadata)
+
+
+# ==============================================================================
+# ENTRAÎNEMENT
+# ==============================================================================
+
+def collect_corpus(text_files=(), pdf_paths=()):
+    """Rassemble les phrases distinctes des fichiers texte (une par ligne) et des PDF."""
+    from PyPDF2 import PdfReader
+
+    from scripts.grading import split_into_sentences
+
+    sentences = []
+    for path in text_files:
+        with open(path, "r", encoding="utf-8") as f:
+            sentences.extend(line.strip() for line in f if line.strip())
+    for path in pdf_paths:
+        text = "".join(page.extract_text() or "" for page in PdfReader(path).pages)
+        sentences.extend(split_into_sentences(text))
+    return list(dict.fromkeys(sentences))
+
+
+def train_distilled_scorer(sentences, use_model, zero_shot, models_dir=CLARITY_MODELS_DIR, alpha=1.0):
+    """Étiquette `sentences` avec le zero-shot, entraîne l'élève et écrit l'artefact versionné."""
+    import joblib
+    from sklearn.linear_model import Ridge
+    from sklearn.model_selection import train_test_split
+
+    from scripts.clarity import score_clarity_batch
+    from scripts.embedding import embed_texts
+    from scripts.models import USE_MODEL_URL, ZERO_SHOT_MODEL_ID
+
+    if len(sentences) < 10:
+        raise ValueError("Corpus trop petit pour entraîner un classifieur (10 phrases minimum).")
+
+    labels = np.asarray(score_clarity_batch({"corpus": sentences}, zero_shot)["corpus"])
+    features = embed_texts(sentences, use_model)
+
+    # Régression sur le logit : l'élève reproduit le score continu du professeur
+    x_train, x_test, y_train, y_test = train_test_split(features, labels, test_size=0.2, random_state=0)
+    model = Ridge(alpha=alpha).fit(x_train, _logit(y_train))
+    predicted = _sigmoid(model.predict(x_test))
+    model.fit(features, _logit(labels))
+
+    versions = list_versions(models_dir)
+    version = versions[-1] + 1 if versions else 1
+    metadata = {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "teacher_model": ZERO_SHOT_MODEL_ID,
+        "encoder": USE_MODEL_URL,
+        "estimator": f"Ridge(alpha={alpha}) sur logit(P(claire))",
+        "n_sentences": len(sentences),
+        "holdout_mae": float(np.mean(np.abs(predicted - y_test))),
+        "holdout_corr": float(np.corrcoef(predicted, y_test)[0, 1]) if len(y_test) > 1 else None,
+    }
+
+    models_dir.mkdir(parents=True, exist_ok=True)
+    artifact = models_dir / f"clarity-v{version}.joblib"
+    joblib.dump(model, artifact)
+    with open(artifact.with_suffix(".json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    return artifact, metadata
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distillation du score de clarté zero-shot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="Étiqueter un corpus et entraîner un nouvel artefact")
+    train.add_argument("--corpus", nargs="*", default=[], help="Fichiers texte, une phrase par ligne")
+    train.add_argument("--pdf", nargs="*", default=None, help="PDF sources (défaut : corrigés de DOCS_DIR)")
+    train.add_argument("--alpha", type=float, default=1.0)
+    sub.add_parser("list", help="Lister les artefacts disponibles")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for v in list_versions():
+            print(f"clarity-v{v}")
+    else:
+        from scripts.models import ModelRegistry
+
+        pdfs = args.pdf if args.pdf is not None else sorted(Path(DOCS_DIR).glob("*.pdf"))
+        corpus = collect_corpus(args.corpus, pdfs)
+        registry = ModelRegistry()
+        path, meta = train_distilled_scorer(
+            corpus, registry.get("use"), registry.get("zero_shot"), alpha=args.alpha
+        )
+        print(f"Artefact écrit : {path}")
+        print(json.dumps(meta, ensure_ascii=False, indent=2))
@@ -19,19 +19,21 @@ else:
 # 2. IMPORTS DES LIBRAIRIES (Une fois la config faite)
 # ==============================================================================
 import streamlit as st
-import tensorflow_hub as hub
-import tensorflow as tf
-import numpy as np
-import torch
-import pdfplumber
 import re
-import json
-import concurrent.futures
 import base64
-from pathlib import Path
-
-from PyPDF2 import PdfReader
-from transformers import BertTokenizer, BertForNextSentencePrediction, pipeline
+import time
+
+from scripts.models import ModelRegistry, shared_registry
+from scripts.jobs import GRADING_WORKERS, GradingJobQueue, QUEUED, RUNNING, DONE, shared_job_queue
+from scripts.paths import DATA_DIR
+from scripts.ingest import ingest_pdf
+from scripts.submission_store import create_run
+from scripts.uploads import upload_source
+# Logique de notation pure (sans Streamlit), partagée avec les workers
+from scripts.grading import (
+    extract_text_from_pdf as _extract_text_from_pdf,
+    grade_submission,
+)
 
 import firebase_admin
 from firebase_admin import credentials, firestore
@@ -40,22 +42,9 @@ from firebase_admin import credentials, firestore
 # 3. CONFIGURATION DES CHEMINS ET FIREBASE
 # ==============================================================================
 
-# Détermination de la racine du projet
-try:
-    APP_ROOT = Path(__file__).resolve().parent
-except NameError:
-    APP_ROOT = Path.cwd()
-
-# Si ce fichier est dans /scripts, on remonte d'un cran
-if APP_ROOT.name == "scripts":
-    APP_ROOT = APP_ROOT.parent
-
-# Définition du dossier DATA
-DATA_DIR = Path(os.getenv("DATA_DIR", APP_ROOT / "data"))
+# Racine du projet et dossier DATA (voir scripts/paths.py)
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-BASE_BEN_DIR = DATA_DIR / "ben"
-BASE_BEN_DIR.mkdir(parents=True, exist_ok=True)
 
 # Initialisation de Firebase (une seule fois)
 if not firebase_admin._apps:
@@ -79,83 +68,36 @@ else:
 # 4. FONCTIONS UTILITAIRES ET LOGIQUE MÉTIER
 # ==============================================================================
 
-def get_user_dir(user_email: str, user_login: str | None = None) -> Path:
-    """
-    Retourne /data/ben/<login>/ en déduisant le login
-    """
-    login = user_login or (user_email.split("@")[0] if user_email and "@" in user_email else None)
-    if not login:
-        st.error("Login utilisateur introuvable.")
-        st.stop()
-    d = BASE_BEN_DIR / login
-    d.mkdir(parents=True, exist_ok=True)
-    return d
-
-def calculate_mean_similarity(text1, text2, use_model):
-    embeddings = use_model([text1, text2])
-    emb1 = embeddings[0].numpy()
-    emb2 = embeddings[1].numpy()
-    # Sécurité division par zéro
-    norm1 = np.linalg.norm(emb1)
-    norm2 = np.linalg.norm(emb2)
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
-    sim = np.dot(emb1, emb2) / (norm1 * norm2)
-    return float(sim)
-
-# --- Fonctions de chargement des modèles (pour le ThreadPool) ---
-def _load_use():
-    return hub.load("https://tfhub.dev/google/universal-sentence-encoder-large/5")
-
-def _load_nsp_tokenizer():
-    return BertTokenizer.from_pretrained('bert-base-uncased')
-
-def _load_nsp_model():
-    return BertForNextSentencePrediction.from_pretrained('bert-base-uncased')
-
-def _load_zero_shot():
-    device = 0 if torch.cuda.is_available() else -1
-    return pipeline("zero-shot-classification", model="facebook/bart-large-mnli", device=device)
-
-@st.cache_resource(show_spinner="Chargement des modèles IA en cours...")
-def load_all_models():
-    """Charge tous les modèles lourds en parallèle."""
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        fut_use = executor.submit(_load_use)
-        fut_nsp_tokenizer = executor.submit(_load_nsp_tokenizer)
-        fut_nsp_model = executor.submit(_load_nsp_model)
-        fut_zero_shot = executor.submit(_load_zero_shot)
-        
-        return (
-            fut_use.result(),
-            fut_nsp_tokenizer.result(),
-            fut_nsp_model.result(),
-            fut_zero_shot.result()
-        )
+# --- Registre des modèles (chargés au premier usage, partagé entre sessions) ---
+@st.cache_resource
+def get_model_registry():
+    """Registre unique par processus : seuls les modèles réellement utilisés sont chargés."""
+    # Sous scripts/launcher.py ou scripts/warmup.py, les modèles sont déjà (en cours de) chargement
+    return shared_registry() or ModelRegistry()
+
+def get_model(name):
+    registry = get_model_registry()
+    if registry.is_loaded(name):
+        return registry.get(name)
+    with st.spinner("Chargement des modèles IA en cours..."):
+        return registry.get(name)
+
+# --- File de notation en arrière-plan (si GRADING_WORKERS > 0) ---
+@st.cache_resource
+def get_job_queue():
+    """Pool de workers unique par processus Streamlit, partagé entre sessions."""
+    # Sous scripts/warmup.py, le pool est déjà démarré et ses workers préchauffés
+    return shared_job_queue() or GradingJobQueue(GRADING_WORKERS)
 
 def extract_first_line(pdf_path):
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            if len(pdf.pages) > 0:
-                first_page_text = pdf.pages[0].extract_text()
-                if first_page_text:
-                    return first_page_text.splitlines()[0].strip()
-    except Exception as e:
-        st.warning(f"Erreur lecture PDF {pdf_path.name}: {e}")
-    return None
+    document = ingest_pdf(pdf_path)
+    if document.error:
+        st.warning(f"Erreur lecture PDF {pdf_path.name}: {document.error}")
+    return document.first_line
 
 def count_questions_in_pdf(pdf_path):
-    questions_count = 0
-    question_pattern = re.compile(r'Q\d+')
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    questions_count += len(question_pattern.findall(text))
-    except Exception as e:
-        return -1
-    return questions_count
+    # -1 si le PDF est illisible
+    return ingest_pdf(pdf_path).question_count
 
 def initial_checks(student_pdf_path, prof_pdf_path):
     if not student_pdf_path.exists():
@@ -165,198 +107,37 @@ def initial_checks(student_pdf_path, prof_pdf_path):
         st.error(f"Fichier prof introuvable : {prof_pdf_path}")
         return False
 
-    # Vérification sommaire du contenu
-    s_count = count_questions_in_pdf(student_pdf_path)
-    p_count = count_questions_in_pdf(prof_pdf_path)
-
-    if s_count == -1 or p_count == -1:
-        st.warning("Impossible de lire correctement les fichiers PDF pour compter les questions.")
-        # On ne bloque pas forcément ici, mais on avertit
-    elif s_count != p_count:
-        st.warning(f"Attention : Le nombre de questions détectées diffère (Étudiant: {s_count}, Prof: {p_count}).")
-        # On peut choisir de retourner False si on veut être strict, ou True pour continuer
-    
+    # La copie a été pré-vérifiée au dépôt (scripts/preflight.py) ; la
+    # comparaison détaillée avec le corrigé est faite par la notation, sur le
+    # document qu'elle lit de toute façon (result['warnings']) : aucun PDF
+    # n'est lu ici, ni deux fois (UI puis worker)
     st.success("Fichiers validés. Analyse en cours...")
     return True
 
 def extract_text_from_pdf(pdf_path):
     try:
-        with open(pdf_path, "rb") as file:
-            pdf_reader = PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                extracted = page.extract_text()
-                if extracted:
-                    text += extracted
-            return text
+        return _extract_text_from_pdf(pdf_path)
     except Exception as e:
         st.error(f"Erreur extraction texte {pdf_path.name}: {e}")
         return ""
 
-def split_into_questions(text):
-    # Découpage basé sur "Q1(5)", "Q2(10)", etc.
-    sections = re.split(r'(Q\d+\(\d+\))', text)
-    questions = {}
-    # sections[0] est le texte avant la Q1
-    for i in range(1, len(sections), 2):
-        question_key = sections[i] # Ex: "Q1(5)"
-        question_content = sections[i+1].strip() if i+1 < len(sections) else ""
-        
-        # Extraction des points entre parenthèses
-        m = re.search(r'\((\d+)\)', question_key)
-        points = int(m.group(1)) if m else 0
-        
-        # Clé propre "Q1"
-        key_name = question_key.split('(')[0]
-        questions[key_name] = {'text': question_content, 'points': points}
-    return questions
-
-def load_concepts_and_authors():
-    # Charge depuis les fichiers JSON supposés être dans le dossier scripts/ ou racine
-    concepts_path = Path("scripts/management_concepts.json")
-    authors_path = Path("scripts/management_authors.json")
-    
-    # Fallback si on ne trouve pas dans scripts/
-    if not concepts_path.exists(): concepts_path = Path("management_concepts.json")
-    if not authors_path.exists(): authors_path = Path("management_authors.json")
-
-    c, a = {}, {}
-    try:
-        if concepts_path.exists():
-            with open(concepts_path, 'r', encoding='utf-8') as f:
-                c = json.load(f)
-        if authors_path.exists():
-            with open(authors_path, 'r', encoding='utf-8') as f:
-                a = json.load(f)
-    except Exception as e:
-        st.warning(f"Erreur chargement JSON concepts/auteurs: {e}")
-    return c, a
-
-def find_management_concepts(text, concepts):
-    found_concepts = {concept: {'found': False, 'verbs': []} for concept in concepts.keys()}
-    for concept, verbs in concepts.items():
-        verb_forms = []
-        for verb in verbs:
-            verb_forms.extend([f"{verb}{ending}" for ending in ['', 'e', 'es', 'ons', 'ez', 'ent', 'ant']])
-        # Regex complexe pour trouver le concept ou ses verbes associés
-        pattern_str = fr"\b(?:{'|'.join(verb_forms)})\w*\b|\b(?:l')?{re.escape(concept)}\b"
-        pattern = re.compile(pattern_str, re.IGNORECASE)
-        matches = pattern.findall(text)
-        if matches:
-            found_concepts[concept]['found'] = True
-            found_concepts[concept]['verbs'].extend(matches)
-    return found_concepts
-
-def find_management_authors(text, auteurs):
-    found_authors = {author: False for author in auteurs.keys()}
-    for author, variations in auteurs.items():
-        pattern = re.compile(fr"\b(?:{'|'.join(map(re.escape, variations))})\b", re.IGNORECASE)
-        if pattern.search(text):
-            found_authors[author] = True
-    return found_authors
-
 def print_missing_concepts(prof_concepts, etudiant_concepts):
     # Logique d'affichage
     pass # Simplifié pour la lecture, le code original était ok
 
-def calculate_coherence_score_with_use(sentences, use_model):
-    if len(sentences) < 2:
-        return 1.0
-    scores = []
-    for i in range(len(sentences)-1):
-        try:
-            embeddings = use_model([sentences[i], sentences[i+1]])
-            emb1 = embeddings[0].numpy()
-            emb2 = embeddings[1].numpy()
-            sim = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
-            scores.append(max(0.0, min(sim, 1.0)))
-        except:
-            continue
-    return float(np.mean(scores)) if scores else 1.0
-
-def split_into_sentences(text):
-    return [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
-
-def analyze_clarity_and_provide_feedback(text, zero_shot):
-    sentences = split_into_sentences(text)
-    if not sentences:
-        return 0.0
-    
-    clarity_scores = []
-    candidate_labels = ["claire", "confuse"]
-    
-    for sentence in sentences:
-        try:
-            result = zero_shot(sentence, candidate_labels)
-            # Index de "claire"
-            score = result["scores"][result["labels"].index("claire")]
-            clarity_scores.append(score)
-        except:
-            clarity_scores.append(0.5)
-            
-    avg = sum(clarity_scores) / len(clarity_scores)
-    st.info(f"Score clarté : {avg:.2f}")
-    return avg
-
-def calculate_scores_logic(prof_c, etu_c, prof_a, etu_a):
-    # Calcul Concept
-    total_prof_c = sum(1 for c in prof_c.values() if c['found'])
-    match_c = sum(1 for k, v in prof_c.items() if v['found'] and etu_c.get(k, {'found':False})['found'])
-    c_score = match_c / total_prof_c if total_prof_c > 0 else 1.0
-
-    # Calcul Auteur
-    total_prof_a = sum(prof_a.values())
-    match_a = sum(etu_a.values()) # Attention: ici on compte tous les auteurs trouvés par l'étudiant
-    # Idéalement on devrait comparer par rapport à ceux du prof, mais gardons la logique originale
-    a_score = min(match_a / total_prof_a, 1.0) if total_prof_a > 0 else 1.0
-    
-    return c_score, a_score
+def render_question_scores(q_key, q):
+    """Affiche le détail d'une question notée par grade_submission()."""
+    st.markdown(f"#### Question {q_key} ({q['points']} pts)")
+    if not q['answered']:
+        st.warning("Réponse vide ou non détectée.")
+        return
 
-def evaluate_question(prof_content, etudiant_content, use_model, nsp_tok, nsp_mod, zero_shot, concepts, auteurs, points):
     st.markdown("---")
-    
-    # 1. Similarité
-    sim_score = calculate_mean_similarity(prof_content, etudiant_content, use_model)
-    st.write(f"Similarité sémantique : {sim_score:.2f}")
-
-    # 2. Cohérence
-    sentences = split_into_sentences(etudiant_content)
-    coh_score = calculate_coherence_score_with_use(sentences, use_model)
-    
-    # 3. Concepts & Auteurs
-    prof_c = find_management_concepts(prof_content, concepts)
-    etu_c = find_management_concepts(etudiant_content, concepts)
-    prof_a = find_management_authors(prof_content, auteurs)
-    etu_a = find_management_authors(etudiant_content, auteurs)
-    
-    conc_score, auth_score = calculate_scores_logic(prof_c, etu_c, prof_a, etu_a)
-    
-    # 4. Clarté
-    clarity = analyze_clarity_and_provide_feedback(etudiant_content, zero_shot)
+    st.write(f"Similarité sémantique : {q['similarity_score']:.2f}")
+    st.info(f"Score clarté : {q['clarity_score']:.2f}")
+    st.metric(label="Note Question", value=f"{q['question_score']:.2f}/{q['points']}")
 
-    # Pondération
-    # Similarity est le plus important (60%)
-    weights = {'sim': 0.6, 'coh': 0.05, 'conc': 0.1, 'auth': 0.1, 'clar': 0.15}
-    
-    weighted_sum = (sim_score * weights['sim'] + 
-                    coh_score * weights['coh'] + 
-                    conc_score * weights['conc'] + 
-                    auth_score * weights['auth'] + 
-                    clarity * weights['clar'])
-    
-    final_q_score = weighted_sum * points
-    st.metric(label="Note Question", value=f"{final_q_score:.2f}/{points}")
-
-    return {
-        'similarity_score': sim_score,
-        'coherence_score': coh_score,
-        'concept_score': conc_score,
-        'author_score': auth_score,
-        'clarity_score': clarity,
-        'question_score': final_q_score
-    }
-
-def enregistrer_note_firebase_incremental_chronologique(email, nom_fichier, note):
+def enregistrer_note_firebase_incremental_chronologique(email, nom_fichier, note, lexicon_version=None):
     if not db:
         return # Pas de firebase configuré
     try:
@@ -377,76 +158,131 @@ def enregistrer_note_firebase_incremental_chronologique(email, nom_fichier, note
         new_key = f"{nom_fichier}{suffix}"
 
         doc_ref.set({new_key: note}, merge=True)
+        if lexicon_version:
+            # Version des lexiques dans une collection à part : code2 lit chaque
+            # champ de notes_etudiants comme une note
+            db.collection("notes_versions").document(email).set(
+                {new_key: {"lexicon_version": lexicon_version}}, merge=True)
     except Exception as e:
         st.error(f"Erreur sauvegarde Firebase: {e}")
 
-def supprimer_fichiers_dossier(chemin_dossier: Path):
-    if chemin_dossier.exists():
-        for p in chemin_dossier.iterdir():
-            if p.is_file():
-                try:
-                    p.unlink()
-                except: pass
-
 # ==============================================================================
 # 5. FONCTION PRINCIPALE
 # ==============================================================================
 
-def main(user_email, selected_file, user_login=None):
-    # Récupération du dossier utilisateur correct
-    BEN_DIR = get_user_dir(user_email, user_login)
-    
-    etudiant_pdf_path = BEN_DIR / "Etudiant.pdf"
-    prof_pdf_path = BEN_DIR / "prof.pdf"
+def prepare_run():
+    """
+    Entrées figées de cette notation (liens vers le magasin adressé par contenu) :
+    (chemin copie, chemin corrigé). Arrête la page si un fichier manque.
+    """
+    student_sha = st.session_state.get("student_sha")
+    prof_sha = st.session_state.get("prof_sha")
+    if not student_sha or not prof_sha:
+        st.error("Chargez votre devoir et choisissez un corrigé avant de lancer l'analyse.")
+        st.stop()
+    try:
+        _, etudiant_pdf_path, prof_pdf_path = create_run(student_sha, prof_sha)
+    except FileNotFoundError:
+        st.error("Fichiers expirés sur le serveur : merci de les déposer à nouveau.")
+        st.stop()
+    return etudiant_pdf_path, prof_pdf_path
+
+def finished_result():
+    """
+    Résultat déjà calculé et enregistré pour ces fichiers, sinon None. Les sha
+    restent en session : sans lui, chaque rerun de la page (bouton de
+    téléchargement...) noterait à nouveau la copie et enregistrerait une note de plus.
+    """
+    finished = st.session_state.get("grading_result")
+    key = (st.session_state.get("student_sha"), st.session_state.get("prof_sha"))
+    if finished is not None and finished["key"] == key:
+        return finished
+    return None
+
+def main(user_email, selected_file):
+    etudiant_pdf_path, prof_pdf_path = prepare_run()
+
+    # Petit fichier encore en mémoire dans le widget de dépôt : lu directement, sans relire le disque
+    upload = st.session_state.get("student_upload")
+    etudiant_source = etudiant_pdf_path
+    if upload is not None and upload.sha256 == st.session_state.student_sha:
+        etudiant_source = upload_source(upload, st.session_state.get("stu_up"))
 
     if not initial_checks(etudiant_pdf_path, prof_pdf_path):
         st.stop()
 
-    # Chargement Modèles
-    use_model, nsp_tokenizer, nsp_model, zero_shot = load_all_models()
-    concepts, auteurs = load_concepts_and_authors()
-
-    # Extraction Texte
-    etudiant_text = extract_text_from_pdf(etudiant_pdf_path)
-    prof_text = extract_text_from_pdf(prof_pdf_path)
+    # Notation (les modèles nécessaires sont chargés au premier usage)
+    try:
+        result = grade_submission(etudiant_source, prof_pdf_path, get_model)
+    except Exception as e:
+        st.error(f"Erreur pendant l'analyse : {e}")
+        st.stop()
 
-    # Parsing Questions
-    etudiant_questions = split_into_questions(etudiant_text)
-    prof_questions = split_into_questions(prof_text)
+    show_grading_result(user_email, selected_file, result, prof_pdf_path)
 
-    global_scores = []
-    question_scores = {}
-    total_points = sum(q['points'] for q in prof_questions.values())
+def main_async(user_email, selected_file):
+    """
+    Variante non bloquante de main() : la notation est soumise à la file de
+    workers, puis chaque rerun Streamlit interroge son statut jusqu'au résultat.
+    """
+    queue = get_job_queue()
+
+    job_id = st.session_state.get("grading_job_id")
+    if job_id is None or queue.status(job_id) is None:
+        # Le job lit les entrées figées de son run, même si l'utilisateur redépose entre-temps
+        etudiant_pdf_path, prof_pdf_path = prepare_run()
+        if not initial_checks(etudiant_pdf_path, prof_pdf_path):
+            st.stop()
+        job_id = queue.submit(etudiant_pdf_path, prof_pdf_path)
+        st.session_state.grading_job_id = job_id
+        st.session_state.grading_job_prof = prof_pdf_path
+
+    status = queue.status(job_id)
+    if status in (QUEUED, RUNNING):
+        if status == QUEUED:
+            st.info("⏳ Analyse en file d'attente...")
+        else:
+            st.info("🧠 Analyse en cours...")
+        time.sleep(1)
+        st.rerun()
+
+    del st.session_state["grading_job_id"]
+    prof_pdf_path = st.session_state.pop("grading_job_prof")
+    if status == DONE:
+        show_grading_result(user_email, selected_file, queue.result(job_id), prof_pdf_path)
+    else:
+        st.error(f"Erreur pendant l'analyse : {queue.error(job_id)}")
 
+def show_grading_result(user_email, selected_file, result, prof_pdf_path, record=True):
+    """
+    Affiche une note calculée, l'enregistre (une seule fois : `record` faux
+    pour un simple réaffichage) et gère l'accès au corrigé.
+    """
     st.markdown("# 📊 DÉBUT DE L'ANALYSE")
-    
-    for q_key, q_data in prof_questions.items():
-        st.markdown(f"#### Question {q_key} ({q_data['points']} pts)")
-        
-        etudiant_content = etudiant_questions.get(q_key, {"text": ""})['text']
-        
-        if not etudiant_content:
-            st.warning("Réponse vide ou non détectée.")
-            question_scores[q_key] = 0
-            continue
-            
-        scores = evaluate_question(
-            q_data['text'], etudiant_content,
-            use_model, nsp_tokenizer, nsp_model, zero_shot,
-            concepts, auteurs, q_data['points']
-        )
-        global_scores.append(scores)
-        question_scores[q_key] = scores['question_score']
-
-    # Calcul final
-    total_score = sum(question_scores.values())
-    final_grade_20 = (total_score / total_points) * 20 if total_points > 0 else 0
+
+    # On ne bloque pas ici, mais on avertit
+    for warning in result.get('warnings', []):
+        st.warning(warning)
+
+    for q_key, q in result['questions'].items():
+        render_question_scores(q_key, q)
+
+    final_grade_20 = result['final_grade_20']
 
     st.divider()
     st.markdown(f"## 🏆 Note Finale : {final_grade_20:.2f}/20")
+    if result.get('lexicon_version'):
+        st.caption(f"Lexiques version {result['lexicon_version']}")
     
     # Sauvegarde
-    enregistrer_note_firebase_incremental_chronologique(user_email, selected_file, final_grade_20)
+    if record:
+        enregistrer_note_firebase_incremental_chronologique(
+            user_email, selected_file, final_grade_20, result.get('lexicon_version'))
+        st.session_state.grading_result = {
+            "key": (st.session_state.get("student_sha"), st.session_state.get("prof_sha")),
+            "result": result,
+            "prof_pdf_path": prof_pdf_path,
+        }
 
     # ... (le code précédent reste identique jusqu'à l'affichage du corrigé) ...
 
@@ -486,9 +322,15 @@ def main(user_email, selected_file, user_login=None):
     else:
         st.info(f"🔒 Le corrigé est verrouillé. Obtenez au moins 16/20 pour le voir (Note actuelle : {final_grade_20:.2f}/20).")
 
-    # Nettoyage automatique des fichiers temporaires
-    supprimer_fichiers_dossier(BEN_DIR)
+    # Pas de nettoyage ici : le run est supprimé par le ménage du magasin (TTL + quota)
 
 # Point d'entrée appelé par app.py
 def code3(user_email, selected_file):
-    main(user_email, selected_file)
\ No newline at end of file
+    finished = finished_result()
+    if finished is not None:
+        show_grading_result(user_email, selected_file, finished["result"],
+                            finished["prof_pdf_path"], record=False)
+    elif GRADING_WORKERS > 0:
+        main_async(user_email, selected_file)
+    else:
+        main(user_email, selected_file)
\ No newline at end of file
@@ -0,0 +1,217 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from scripts.paths import DATA_DIR, DOCS_DIR
+from scripts.lexicon import lexicon_fingerprint
+from scripts.pdf_backends import get_backend
+
+# ==============================================================================
+# INDEX PRÉCOMPILÉ DES CORRIGÉS
+# ==============================================================================
+# Pour chaque corrigé, tout le travail côté professeur (extraction du texte,
+# découpage en questions, concepts/auteurs trouvés, embeddings) est fait une
+# seule fois et stocké dans DATA_DIR/index/<hash du PDF>.{json,npz}.
+# La notation recharge cet artefact au lieu de tout recalculer. Il est
+# reconstruit si le format, l'encodeur, les lexiques ou le moteur PDF
+# (PDF_BACKEND) changent.
+#
+# Usage (au démarrage ou hors ligne) :
+#   python -m scripts.corrige_index [--force]
+
+INDEX_DIR = Path(os.getenv("CORRIGE_INDEX_DIR", DATA_DIR / "index"))
+# À incrémenter si le format de l'artefact change
+INDEX_FORMAT_VERSION = 1
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class CorrigeIndex:
+    content_hash: str
+    source: str
+    encoder: str
+    lexicon: str
+    backend: str = ""  # moteur PDF qui a extrait le texte du corrigé
+    # {q_key: {'text', 'points', 'sentences', 'concepts', 'authors'}}
+    questions: dict = field(default_factory=dict)
+    # {q_key: {'prof': vecteur, 'sentences': matrice}}
+    embeddings: dict = field(default_factory=dict)
+
+    @property
+    def total_points(self):
+        return sum(q['points'] for q in self.questions.values())
+
+
+def _index_paths(content_hash, index_dir=INDEX_DIR):
+    return index_dir / f"{content_hash}.json", index_dir / f"{content_hash}.npz"
+
+
+def _atomic_write(path, write):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def save_corrige_index(index, index_dir=INDEX_DIR):
+    json_path, npz_path = _index_paths(index.content_hash, index_dir)
+    arrays = {}
+    for q_key, emb in index.embeddings.items():
+        arrays[f"{q_key}__prof"] = emb['prof']
+        arrays[f"{q_key}__sentences"] = emb['sentences']
+    # Les embeddings d'abord : un .json présent garantit un .npz complet
+    _atomic_write(npz_path, lambda f: np.savez(f, **arrays))
+    meta = {
+        "format": INDEX_FORMAT_VERSION,
+        "content_hash": index.content_hash,
+        "source": index.source,
+        "encoder": index.encoder,
+        "lexicon": index.lexicon,
+        "backend": index.backend,
+        "questions": index.questions,
+    }
+    _atomic_write(json_path, lambda f: f.write(json.dumps(meta, ensure_ascii=False, indent=1).encode("utf-8")))
+    return json_path
+
+
+def load_corrige_index(content_hash, encoder, lexicon, index_dir=INDEX_DIR, backend=None):
+    """
+    Charge l'index d'un corrigé, ou None s'il est absent ou périmé.
+    `backend` : moteur PDF attendu (PDF_BACKEND par défaut).
+    """
+    backend = backend or get_backend().name
+    json_path, npz_path = _index_paths(content_hash, index_dir)
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if ((meta.get("format"), meta.get("encoder"), meta.get("lexicon"), meta.get("backend"))
+                != (INDEX_FORMAT_VERSION, encoder, lexicon, backend)):
+            return None
+        with np.load(npz_path, allow_pickle=False) as arrays:
+            embeddings = {
+                q_key: {
+                    'prof': arrays[f"{q_key}__prof"],
+                    'sentences': arrays[f"{q_key}__sentences"],
+                }
+                for q_key in meta["questions"]
+            }
+    except (OSError, ValueError, KeyError):
+        return None
+    return CorrigeIndex(
+        content_hash=meta["content_hash"],
+        source=meta["source"],
+        encoder=meta["encoder"],
+        lexicon=meta["lexicon"],
+        backend=meta["backend"],
+        questions=meta["questions"],
+        embeddings=embeddings,
+    )
+
+
+def build_corrige_index(pdf_path, use_model, concepts, auteurs, encoder, content_hash=None, cache=None):
+    """Calcule tout le travail côté professeur pour un corrigé."""
+    from scripts.grading import (
+        extract_text_from_pdf,
+        split_into_questions,
+    )
+    from scripts.lexicon import match_lexicon
+    from scripts.preprocess import prepare_answer
+    from scripts.embedding import embed_texts
+
+    pdf_path = Path(pdf_path)
+    content_hash = content_hash or file_sha256(pdf_path)
+    questions = split_into_questions(extract_text_from_pdf(pdf_path))
+
+    texts = []
+    indexed = {}
+    for q_key, q_data in questions.items():
+        prepared = prepare_answer(q_data['text'])
+        sentences = prepared.sentences
+        found_concepts, found_authors = match_lexicon(prepared, concepts, auteurs)
+        indexed[q_key] = {
+            'text': q_data['text'],
+            'points': q_data['points'],
+            'sentences': sentences,
+            'concepts': found_concepts,
+            'authors': found_authors,
+        }
+        texts.append(q_data['text'])
+        texts.extend(sentences)
+
+    matrix = embed_texts(texts, use_model, cache=cache)
+    embeddings = {}
+    start = 0
+    for q_key, q in indexed.items():
+        n = len(q['sentences'])
+        embeddings[q_key] = {
+            'prof': matrix[start],
+            'sentences': matrix[start + 1:start + 1 + n],
+        }
+        start += 1 + n
+
+    return CorrigeIndex(
+        content_hash=content_hash,
+        source=pdf_path.name,
+        encoder=encoder,
+        lexicon=lexicon_fingerprint(concepts, auteurs),
+        backend=get_backend().name,
+        questions=indexed,
+        embeddings=embeddings,
+    )
+
+
+def get_corrige_index(pdf_path, get_use_model, concepts, auteurs, encoder, cache=None, index_dir=INDEX_DIR,
+                      lexicon=None):
+    """
+    Index du corrigé `pdf_path` : chargé depuis le disque s'il est à jour,
+    sinon construit puis sauvegardé. `get_use_model` n'est appelé qu'en cas de construction.
+    `lexicon` : version des lexiques si elle est déjà connue (snapshot du service).
+    """
+    content_hash = file_sha256(pdf_path)
+    index = load_corrige_index(content_hash, encoder, lexicon or lexicon_fingerprint(concepts, auteurs), index_dir)
+    if index is None:
+        index = build_corrige_index(pdf_path, get_use_model(), concepts, auteurs, encoder, content_hash, cache)
+        save_corrige_index(index, index_dir)
+    return index
+
+
+def build_all(docs_dir=DOCS_DIR, force=False, index_dir=INDEX_DIR):
+    """Indexe tous les corrigés de DOCS_DIR (ceux déjà à jour sont sautés sauf --force)."""
+    from scripts.grading import load_concepts_and_authors
+    from scripts.models import ModelRegistry, model_fingerprint
+
+    registry = ModelRegistry()
+    concepts, auteurs = load_concepts_and_authors()
+    encoder = "/".join(model_fingerprint("use"))
+    lexicon = lexicon_fingerprint(concepts, auteurs)
+
+    for pdf_path in sorted(Path(docs_dir).glob("*.pdf")):
+        content_hash = file_sha256(pdf_path)
+        if not force and load_corrige_index(content_hash, encoder, lexicon, index_dir) is not None:
+            print(f"✔ {pdf_path.name} (à jour)")
+            continue
+        index = build_corrige_index(pdf_path, registry.get("use"), concepts, auteurs, encoder, content_hash)
+        save_corrige_index(index, index_dir)
+        print(f"✚ {pdf_path.name} : {len(index.questions)} questions, {index.total_points} points")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexation des corrigés de DOCS_DIR")
+    parser.add_argument("--force", action="store_true", help="Reconstruire même les index à jour")
+    parser.add_argument("--docs-dir", default=str(DOCS_DIR))
+    args = parser.parse_args()
+    build_all(Path(args.docs_dir), force=args.force)
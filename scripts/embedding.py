@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+
+# ==============================================================================
+# ÉTAPE D'EMBEDDING GROUPÉE (Universal Sentence Encoder)
+# ==============================================================================
+# Au lieu d'appeler use_model([a, b]) pour chaque paire de textes, on rassemble
+# tous les textes d'une copie (questions prof/étudiant + phrases de l'étudiant),
+# on les encode en quelques gros lots, puis similarité et cohérence deviennent
+# de simples produits scalaires sur une matrice L2-normalisée.
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+
+def embed_texts(texts, use_model, batch_size=EMBED_BATCH_SIZE, cache=None):
+    """
+    Encode une liste de textes par lots et retourne une matrice (n, dim)
+    dont chaque ligne est L2-normalisée. Les doublons ne sont encodés qu'une fois
+    et, si `cache` est fourni (scripts/cache.py), seuls les textes absents du cache le sont.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    unique = list(dict.fromkeys(texts))
+    cached = cache.get_many(unique) if cache is not None else {}
+    vectors = [cached.get(text) for text in unique]
+
+    # Tri par longueur : les lots regroupent des textes de taille voisine,
+    # ce qui limite le padding interne du modèle.
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    order = sorted(missing, key=lambda i: len(unique[i]))
+
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        batch = use_model([unique[i] for i in idx])
+        batch = np.asarray(batch.numpy() if hasattr(batch, "numpy") else batch, dtype=np.float32)
+        for row, i in enumerate(idx):
+            vectors[i] = batch[row]
+            if cache is not None:
+                cache.put(unique[i], batch[row])
+
+    matrix = np.vstack(vectors)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    # Sécurité division par zéro : un vecteur nul reste nul (similarité 0)
+    matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    position = {text: i for i, text in enumerate(unique)}
+    return matrix[[position[t] for t in texts]]
+
+
+def build_submission_embeddings(prof_questions, answers, use_model, cache=None, prof_embeddings=None):
+    """
+    Encode en une seule passe tout ce dont la notation a besoin.
+
+    `answers` : {q_key: PreparedAnswer} (réponses déjà découpées en phrases,
+    voir scripts/preprocess.py).
+    Si `prof_embeddings` ({q_key: vecteur}, ex. index du corrigé) est fourni,
+    les textes du professeur ne sont pas ré-encodés.
+    Retourne {q_key: {'prof': vec, 'etudiant': vec, 'sentences': matrice}}
+    pour chaque question du corrigé ayant une réponse étudiante.
+    """
+    texts = []
+    slots = {}
+    for q_key, q_data in prof_questions.items():
+        answer = answers.get(q_key)
+        if answer is None or not answer.text:
+            continue
+        sentences = answer.sentences
+        prof_slot = None
+        if prof_embeddings is None:
+            prof_slot = len(texts)
+            texts.append(q_data['text'])
+        slots[q_key] = (prof_slot, len(texts), len(sentences))
+        texts.append(answer.text)
+        texts.extend(sentences)
+
+    matrix = embed_texts(texts, use_model, cache=cache)
+
+    embeddings = {}
+    for q_key, (prof_slot, start, n_sentences) in slots.items():
+        embeddings[q_key] = {
+            'prof': prof_embeddings[q_key] if prof_slot is None else matrix[prof_slot],
+            'etudiant': matrix[start],
+            'sentences': matrix[start + 1:start + 1 + n_sentences],
+        }
+    return embeddings
+
+
+def similarity_from_embeddings(emb1, emb2):
+    """Similarité cosinus entre deux vecteurs déjà normalisés."""
+    return float(np.dot(emb1, emb2))
+
+
+def coherence_from_embeddings(sentence_matrix):
+    """Moyenne des similarités entre phrases consécutives, bornée à [0, 1]."""
+    if len(sentence_matrix) < 2:
+        return 1.0
+    sims = np.einsum("ij,ij->i", sentence_matrix[:-1], sentence_matrix[1:])
+    return float(np.mean(np.clip(sims, 0.0, 1.0)))
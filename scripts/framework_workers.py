@@ -0,0 +1,236 @@
+import multiprocessing
+import os
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# ==============================================================================
+# TENSORFLOW ET PYTORCH DANS DES SOUS-PROCESSUS DÉDIÉS
+# ==============================================================================
+# Charger tensorflow et torch/transformers dans le même processus Streamlit
+# ralentit le démarrage et fait se battre allocateurs et pools de threads.
+# Avec FRAMEWORK_ISOLATION=1, l'encodeur USE vit dans un processus "tensorflow"
+# et le zero-shot dans un processus "torch". Le grader les appelle via des
+# proxys aux mêmes signatures ; les embeddings reviennent par mémoire partagée
+# (pas de pickling de la matrice) et un worker mort est relancé automatiquement.
+
+FRAMEWORK_ISOLATION = os.getenv("FRAMEWORK_ISOLATION", "0") in ("1", "true", "yes")
+
+# Framework -> modèles qu'il héberge
+FRAMEWORK_MODELS = {
+    "tensorflow": ["use"],
+    "torch": ["zero_shot"],
+}
+
+
+class WorkerCrashed(RuntimeError):
+    """Le sous-processus modèle est mort et n'a pas pu être relancé."""
+
+
+# ==============================================================================
+# CÔTÉ SOUS-PROCESSUS
+# ==============================================================================
+
+def _worker_main(conn, model_names):
+    # Un seul appelant (la boucle ci-dessous) : le micro-batching est fait côté parent
+    os.environ["MICROBATCH_ENABLED"] = "0"
+    from scripts.models import LOCAL_LOADERS, ModelRegistry
+
+    try:
+        registry = ModelRegistry({n: LOCAL_LOADERS[n] for n in model_names})
+        for name in model_names:
+            registry.get(name)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None))
+
+    buffers = {}
+    while True:
+        try:
+            command, payload = conn.recv()
+        except EOFError:
+            return
+        try:
+            if command == "embed":
+                out = registry.get("use")(payload["texts"])
+                out = np.ascontiguousarray(out.numpy() if hasattr(out, "numpy") else out, dtype=np.float32)
+                if out.nbytes > payload["capacity"]:
+                    conn.send(("grow", out.nbytes))
+                    payload = conn.recv()[1]
+                shm = buffers.get(payload["buffer"])
+                if shm is None:
+                    for old in buffers.values():
+                        old.close()
+                    buffers = {payload["buffer"]: shared_memory.SharedMemory(name=payload["buffer"])}
+                    shm = buffers[payload["buffer"]]
+                np.ndarray(out.shape, dtype=np.float32, buffer=shm.buf)[...] = out
+                conn.send(("ok", out.shape))
+            elif command == "zero_shot":
+                results = registry.get("zero_shot")(
+                    payload["sequences"], payload["labels"], batch_size=payload.get("batch_size") or 1
+                )
+                conn.send(("ok", results))
+            elif command == "ping":
+                conn.send(("ok", registry.memory_report()))
+            else:
+                conn.send(("error", f"Commande inconnue : {command}"))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+# ==============================================================================
+# CÔTÉ PARENT
+# ==============================================================================
+
+class FrameworkWorker:
+    """Pilote un sous-processus modèle ; le relance s'il meurt."""
+
+    def __init__(self, framework, model_names=None):
+        self.framework = framework
+        self.model_names = model_names or FRAMEWORK_MODELS[framework]
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._process = None
+        self._conn = None
+        self._shm = None
+
+    def _start(self):
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(
+            target=_worker_main, args=(child_conn, self.model_names),
+            name=f"models-{self.framework}", daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        try:
+            status, detail = parent_conn.recv()
+        except EOFError:
+            status, detail = "error", f"processus terminé (code {process.exitcode})"
+        if status != "ready":
+            process.join(timeout=5)
+            raise WorkerCrashed(f"Worker {self.framework} : échec du chargement ({detail})")
+        self._process, self._conn = process, parent_conn
+
+    def _stop(self):
+        if self._conn is not None:
+            self._conn.close()
+        if self._process is not None and self._process.is_alive():
+            self._process.kill()
+            self._process.join(timeout=5)
+        self._process = self._conn = None
+
+    def _buffer(self, nbytes):
+        if self._shm is None or self._shm.size < nbytes:
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+            self._shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1 << 20))
+        return self._shm
+
+    def _exchange(self, command, payload):
+        self._conn.send((command, payload))
+        status, detail = self._conn.recv()
+        if status == "grow":
+            shm = self._buffer(detail)
+            self._conn.send(("buffer", {"buffer": shm.name}))
+            status, detail = self._conn.recv()
+        if status == "error":
+            raise RuntimeError(f"Worker {self.framework} : {detail}")
+        return detail
+
+    def _ensure_running(self):
+        if self._process is None or not self._process.is_alive():
+            if self._process is not None:
+                self.restarts += 1
+            # Le segment partagé appartient au parent (et au resource tracker commun
+            # aux processus "spawn") : il survit au redémarrage du worker
+            self._stop()
+            self._start()
+
+    def start(self):
+        """Démarre le sous-processus (chargement des modèles) s'il ne tourne pas."""
+        with self._lock:
+            self._ensure_running()
+
+    def call(self, command, payload):
+        with self._lock:
+            for attempt in range(2):
+                self._ensure_running()
+                try:
+                    if command == "embed":
+                        # Capacité estimée : 1024 float32 par texte (USE = 512)
+                        shm = self._buffer(len(payload["texts"]) * 1024 * 4)
+                        payload = {**payload, "buffer": shm.name, "capacity": shm.size}
+                        shape = self._exchange(command, payload)
+                        view = np.ndarray(shape, dtype=np.float32, buffer=self._shm.buf)
+                        # Une seule copie mémoire, hors du segment partagé réutilisé
+                        return np.array(view)
+                    return self._exchange(command, payload)
+                except (EOFError, BrokenPipeError, ConnectionResetError):
+                    # Crash du worker (OOM, segfault...) : relance puis un nouvel essai
+                    self._stop()
+                    self.restarts += 1
+                    if attempt:
+                        raise WorkerCrashed(f"Worker {self.framework} mort pendant « {command} »")
+
+    def report(self):
+        process = self._process
+        return {
+            "models": self.model_names,
+            "pid": process.pid if process is not None else None,
+            "alive": bool(process is not None and process.is_alive()),
+            "restarts": self.restarts,
+            "shared_buffer_bytes": self._shm.size if self._shm is not None else 0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._stop()
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = None
+
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def get_worker(framework):
+    with _workers_lock:
+        if framework not in _workers:
+            _workers[framework] = FrameworkWorker(framework)
+        return _workers[framework]
+
+
+def workers_report():
+    with _workers_lock:
+        workers = dict(_workers)
+    return {name: w.report() for name, w in workers.items()}
+
+
+class SubprocessUseModel:
+    """use_model([textes]) exécuté dans le sous-processus TensorFlow."""
+
+    def __init__(self):
+        get_worker("tensorflow").start()
+
+    def __call__(self, texts):
+        return get_worker("tensorflow").call("embed", {"texts": list(texts)})
+
+
+class SubprocessZeroShot:
+    """zero_shot(phrases, labels, batch_size=...) exécuté dans le sous-processus PyTorch."""
+
+    def __init__(self):
+        get_worker("torch").start()
+
+    def __call__(self, sequences, candidate_labels, batch_size=None):
+        return get_worker("torch").call("zero_shot", {
+            "sequences": sequences,
+            "labels": list(candidate_labels),
+            "batch_size": batch_size,
+        })
@@ -0,0 +1,207 @@
+import re
+
+from scripts.embedding import (
+    build_submission_embeddings,
+    similarity_from_embeddings,
+    coherence_from_embeddings,
+)
+from scripts.clarity import (
+    CLARITY_BACKEND,
+    score_clarity_batch,
+    score_clarity_from_embeddings,
+    clarity_average,
+)
+from scripts.models import model_fingerprint
+from scripts.cache import get_cache
+from scripts.corrige_index import get_corrige_index
+from scripts.ingest import compare_documents, ingest_pdf
+from scripts.lexicon import current_lexicon, find_authors, find_concepts, lexicon_fingerprint, match_lexicon
+from scripts.preprocess import prepare_answer, sentence_spans
+
+# ==============================================================================
+# PIPELINE DE NOTATION (sans Streamlit)
+# ==============================================================================
+# Toute la logique de calcul d'une note, utilisable aussi bien depuis l'UI
+# (scripts/code3.py) que depuis un processus worker (scripts/jobs.py).
+# Les erreurs remontent en exceptions ; l'affichage est laissé à l'appelant.
+
+# Pondération : la similarité est le critère le plus important (60%)
+WEIGHTS = {'sim': 0.6, 'coh': 0.05, 'conc': 0.1, 'auth': 0.1, 'clar': 0.15}
+
+
+def extract_text_from_pdf(pdf_path):
+    # Lecture unique et mise en cache du PDF (voir scripts/ingest.py)
+    document = ingest_pdf(pdf_path)
+    if document.error:
+        raise RuntimeError(document.error)
+    return document.text
+
+def split_into_questions(text):
+    # Découpage basé sur "Q1(5)", "Q2(10)", etc.
+    sections = re.split(r'(Q\d+\(\d+\))', text)
+    questions = {}
+    # sections[0] est le texte avant la Q1
+    for i in range(1, len(sections), 2):
+        question_key = sections[i] # Ex: "Q1(5)"
+        question_content = sections[i+1].strip() if i+1 < len(sections) else ""
+
+        # Extraction des points entre parenthèses
+        m = re.search(r'\((\d+)\)', question_key)
+        points = int(m.group(1)) if m else 0
+
+        # Clé propre "Q1"
+        key_name = question_key.split('(')[0]
+        questions[key_name] = {'text': question_content, 'points': points}
+    return questions
+
+def split_into_sentences(text):
+    return [text[start:end] for start, end in sentence_spans(text)]
+
+def load_concepts_and_authors():
+    # Lexiques chargés une fois, versionnés et rechargés à chaud (voir scripts/lexicon.py)
+    snapshot = current_lexicon()
+    return snapshot.concepts, snapshot.auteurs
+
+def find_management_concepts(text, concepts):
+    # Lexique compilé une fois (voir scripts/lexicon.py)
+    return find_concepts(text, concepts)
+
+def find_management_authors(text, auteurs):
+    return find_authors(text, auteurs)
+
+def calculate_scores_logic(prof_c, etu_c, prof_a, etu_a):
+    # Calcul Concept
+    total_prof_c = sum(1 for c in prof_c.values() if c['found'])
+    match_c = sum(1 for k, v in prof_c.items() if v['found'] and etu_c.get(k, {'found':False})['found'])
+    c_score = match_c / total_prof_c if total_prof_c > 0 else 1.0
+
+    # Calcul Auteur
+    total_prof_a = sum(prof_a.values())
+    match_a = sum(etu_a.values()) # Attention: ici on compte tous les auteurs trouvés par l'étudiant
+    # Idéalement on devrait comparer par rapport à ceux du prof, mais gardons la logique originale
+    a_score = min(match_a / total_prof_a, 1.0) if total_prof_a > 0 else 1.0
+
+    return c_score, a_score
+
+def evaluate_question(answer, q_embeddings, clarity_scores, prof_hits, concepts, auteurs, points):
+    # `answer` : réponse prétraitée une seule fois (PreparedAnswer)
+    # 1. Similarité (embeddings calculés en amont pour toute la copie)
+    sim_score = similarity_from_embeddings(q_embeddings['prof'], q_embeddings['etudiant'])
+
+    # 2. Cohérence
+    coh_score = coherence_from_embeddings(q_embeddings['sentences'])
+
+    # 3. Concepts & Auteurs (côté professeur : lus dans l'index du corrigé)
+    prof_c = prof_hits['concepts']
+    prof_a = prof_hits['authors']
+    etu_c, etu_a = match_lexicon(answer, concepts, auteurs)
+
+    conc_score, auth_score = calculate_scores_logic(prof_c, etu_c, prof_a, etu_a)
+
+    # 4. Clarté (scores par phrase calculés en amont pour toute la copie)
+    clarity = clarity_average(clarity_scores)
+
+    weighted_sum = (sim_score * WEIGHTS['sim'] +
+                    coh_score * WEIGHTS['coh'] +
+                    conc_score * WEIGHTS['conc'] +
+                    auth_score * WEIGHTS['auth'] +
+                    clarity * WEIGHTS['clar'])
+
+    return {
+        'similarity_score': sim_score,
+        'coherence_score': coh_score,
+        'concept_score': conc_score,
+        'author_score': auth_score,
+        'clarity_score': clarity,
+        'question_score': weighted_sum * points
+    }
+
+def required_models():
+    """Modèles nécessaires à la notation selon le moteur de clarté configuré."""
+    return ["use", "clarity_distilled" if CLARITY_BACKEND == "distilled" else "zero_shot"]
+
+def grade_submission(etudiant_pdf_path, prof_pdf_path, get_model, concepts=None, auteurs=None):
+    """
+    Note une copie contre un corrigé.
+
+    etudiant_pdf_path peut aussi être le contenu de la copie (bytes), pour noter
+    un petit upload gardé en mémoire sans relire le disque.
+
+    get_model(name) fournit les modèles (registre local, serveur, worker...).
+    Retourne {'questions': {q_key: {...}}, 'total_points', 'total_score',
+    'final_grade_20', 'lexicon_version', 'warnings'}.
+    """
+    if concepts is None or auteurs is None:
+        # Un seul snapshot pour toute la notation, même si les lexiques changent entre-temps
+        snapshot = current_lexicon()
+        concepts, auteurs, lexicon_version = snapshot.concepts, snapshot.auteurs, snapshot.version
+    else:
+        lexicon_version = lexicon_fingerprint(concepts, auteurs)
+
+    use_model = get_model("use")
+
+    # Côté professeur : index précompilé du corrigé (construit une seule fois par PDF)
+    use_cache = get_cache("use", *model_fingerprint("use"))
+    corrige = get_corrige_index(
+        prof_pdf_path, lambda: use_model, concepts, auteurs,
+        encoder="/".join(model_fingerprint("use")), cache=use_cache, lexicon=lexicon_version,
+    )
+    prof_questions = corrige.questions
+
+    # Extraction Texte et parsing des questions de l'étudiant (PDF lu une seule
+    # fois : le même document sert aux vérifications initiales)
+    etudiant_doc = ingest_pdf(etudiant_pdf_path)
+    if etudiant_doc.error:
+        raise RuntimeError(etudiant_doc.error)
+    etudiant_questions = etudiant_doc.questions()
+    warnings = compare_documents(etudiant_doc, ingest_pdf(prof_pdf_path))
+
+    # Prétraitement unique de chaque réponse (phrases, minuscules, mots),
+    # partagé par la similarité, la cohérence, la clarté et les lexiques
+    answers = {q_key: prepare_answer(q_data['text']) for q_key, q_data in etudiant_questions.items()}
+
+    # Embeddings de toute la copie en quelques lots (au lieu d'un appel par paire)
+    submission_embeddings = build_submission_embeddings(
+        prof_questions, answers, use_model,
+        cache=use_cache,
+        prof_embeddings={q_key: emb['prof'] for q_key, emb in corrige.embeddings.items()},
+    )
+    if CLARITY_BACKEND == "distilled":
+        # Clarté prédite depuis les embeddings déjà calculés (BART n'est pas chargé)
+        clarity_by_question = score_clarity_from_embeddings(
+            {q_key: emb['sentences'] for q_key, emb in submission_embeddings.items()},
+            get_model("clarity_distilled"),
+        )
+    else:
+        # Clarté de toutes les phrases en lots regroupés par longueur
+        clarity_by_question = score_clarity_batch(
+            {q_key: answers[q_key].sentences for q_key in submission_embeddings},
+            get_model("zero_shot"),
+            cache=get_cache("clarity", *model_fingerprint("zero_shot")),
+        )
+
+    questions = {}
+    for q_key, q_data in prof_questions.items():
+        if q_key not in submission_embeddings:
+            # Réponse vide ou non détectée
+            questions[q_key] = {'points': q_data['points'], 'answered': False, 'question_score': 0}
+            continue
+        scores = evaluate_question(
+            answers[q_key],
+            submission_embeddings[q_key], clarity_by_question[q_key],
+            q_data, concepts, auteurs, q_data['points']
+        )
+        questions[q_key] = {'points': q_data['points'], 'answered': True, **scores}
+
+    total_points = corrige.total_points
+    total_score = sum(q['question_score'] for q in questions.values())
+    return {
+        'questions': questions,
+        'total_points': total_points,
+        'total_score': total_score,
+        'final_grade_20': (total_score / total_points) * 20 if total_points > 0 else 0,
+        # Version des lexiques utilisés : une note n'est comparable qu'à version égale
+        'lexicon_version': lexicon_version,
+        # Avertissements des vérifications initiales (nombre de questions...)
+        'warnings': warnings,
+    }
@@ -0,0 +1,67 @@
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+
+from scripts.paths import APP_ROOT
+
+# ==============================================================================
+# RAPPORT DU COÛT DES IMPORTS AU DÉMARRAGE
+# ==============================================================================
+# Lance un interpréteur neuf avec `-X importtime`, importe les modules chargés
+# au démarrage de app.py (et, avec --grading, ceux de l'analyse), puis agrège
+# le temps propre de chaque import par paquet de premier niveau.
+#
+# Usage :
+#   python -m scripts.import_report            # imports de la page de connexion
+#   python -m scripts.import_report --grading  # + modules d'analyse (code3, code2)
+
+STARTUP_MODULES = ["streamlit", "utils.auth", "utils.email",
+                   "scripts.uploads", "scripts.submission_store", "scripts.preflight"]
+GRADING_MODULES = ["scripts.code3", "scripts.code2"]
+
+
+def measure_imports(modules):
+    """
+    {paquet de premier niveau: temps propre cumulé (s)} et durée totale (s)
+    de l'import de `modules` dans un processus neuf.
+    """
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        # Dernière ligne de stderr : l'exception (dépendance absente...)
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    by_package = defaultdict(float)
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        by_package[name.split(".")[0]] += int(self_us) / 1e6
+    return dict(by_package), sum(by_package.values())
+
+
+def print_report(modules, top=20):
+    by_package, total = measure_imports(modules)
+    print(f"Imports : {', '.join(modules)}")
+    print(f"Total : {total:.2f} s")
+    for name, seconds in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        print(f"  {seconds:7.3f} s  {100 * seconds / (total or 1):5.1f} %  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coût des imports au démarrage")
+    parser.add_argument("--grading", action="store_true", help="Inclure les modules d'analyse")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    modules = STARTUP_MODULES + (GRADING_MODULES if args.grading else [])
+    try:
+        print_report(modules, args.top)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+
+# ==============================================================================
+# RÉPARTITION DES CŒURS ET ORDONNANCEMENT DES APPELS MODÈLES
+# ==============================================================================
+# USE tourne sur TensorFlow et BART sur PyTorch dans le même processus : par
+# défaut chacun dimensionne ses pools de threads sur TOUS les cœurs, d'où une
+# forte sur-souscription dès que plusieurs sessions notent en même temps.
+# Ici on fixe explicitement les threads intra/inter-op de chaque framework
+# (partage des cœurs réglable) et on plafonne les appels concurrents par
+# modèle : les appels en trop attendent dans une file, et l'attente est
+# mesurée séparément du temps de calcul.
+
+def _available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+CPU_CORES = int(os.getenv("INFERENCE_CPU_CORES", "0")) or _available_cores()
+# Part des cœurs donnée à TensorFlow (USE) ; le reste va à PyTorch (zero-shot)
+CPU_SPLIT_TF = float(os.getenv("INFERENCE_CPU_SPLIT_TF", "0.5"))
+TF_INTER_OP_THREADS = int(os.getenv("TF_INTER_OP_THREADS", "1"))
+TORCH_INTER_OP_THREADS = int(os.getenv("TORCH_INTER_OP_THREADS", "1"))
+# Appels simultanés autorisés par modèle. Avec le micro-batching (par défaut),
+# le modèle n'est appelé que par les threads de regroupement (un pour USE, un
+# par jeu de labels pour le zero-shot) : la limite s'applique entre eux, et
+# l'attente des sessions est celle de la file du batcher (mean_queue_wait_ms).
+MAX_CONCURRENT_CALLS = {
+    "use": int(os.getenv("USE_MAX_CONCURRENT", "1")),
+    "zero_shot": int(os.getenv("ZERO_SHOT_MAX_CONCURRENT", "1")),
+}
+
+
+def thread_split(cores=CPU_CORES, split_tf=CPU_SPLIT_TF):
+    """(threads intra-op TF, threads intra-op torch) pour `cores` cœurs."""
+    if cores <= 1:
+        return 1, 1
+    tf_threads = min(cores - 1, max(1, round(cores * split_tf)))
+    return tf_threads, max(1, cores - tf_threads)
+
+
+def configure_tensorflow_threads():
+    """À appeler avant la première opération TF (sinon sans effet)."""
+    import tensorflow as tf
+
+    intra, _ = thread_split()
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra)
+        tf.config.threading.set_inter_op_parallelism_threads(TF_INTER_OP_THREADS)
+    except RuntimeError:
+        # Runtime TF déjà initialisé : la configuration existante est conservée
+        pass
+
+
+def configure_torch_threads():
+    import torch
+
+    _, intra = thread_split()
+    torch.set_num_threads(intra)
+    try:
+        torch.set_num_interop_threads(TORCH_INTER_OP_THREADS)
+    except RuntimeError:
+        # Ne peut être fixé qu'une fois, avant tout travail inter-op
+        pass
+
+
+class ModelGate:
+    """Plafonne les appels concurrents à un modèle et mesure attente / calcul."""
+
+    def __init__(self, name, max_concurrent=1):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._stats = {"calls": 0, "wait_s": 0.0, "compute_s": 0.0, "max_wait_s": 0.0,
+                       "queued_requests": 0, "queue_wait_s": 0.0, "max_queue_wait_s": 0.0}
+
+    def run(self, fn, *args, **kwargs):
+        queued_at = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        self._slots.acquire()
+        started = time.perf_counter()
+        with self._lock:
+            self._waiting -= 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._slots.release()
+            wait, compute = started - queued_at, time.perf_counter() - started
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["wait_s"] += wait
+                self._stats["compute_s"] += compute
+                self._stats["max_wait_s"] = max(self._stats["max_wait_s"], wait)
+
+    def record_queue_waits(self, waits):
+        """Attentes (s) des requêtes dans la file d'un micro-batcher, avant l'appel au modèle."""
+        with self._lock:
+            self._stats["queued_requests"] += len(waits)
+            self._stats["queue_wait_s"] += sum(waits)
+            self._stats["max_queue_wait_s"] = max(self._stats["max_queue_wait_s"], *waits)
+
+    def report(self):
+        """Attente en file (batcher), attente d'une place (porte) et calcul, séparément."""
+        with self._lock:
+            stats = dict(self._stats)
+            waiting = self._waiting
+        calls = stats["calls"] or 1
+        return {
+            "max_concurrent": self.max_concurrent,
+            "waiting": waiting,
+            "calls": stats["calls"],
+            "queued_requests": stats["queued_requests"],
+            "mean_queue_wait_ms": 1000 * stats["queue_wait_s"] / (stats["queued_requests"] or 1),
+            "max_queue_wait_ms": 1000 * stats["max_queue_wait_s"],
+            "mean_wait_ms": 1000 * stats["wait_s"] / calls,
+            "max_wait_ms": 1000 * stats["max_wait_s"],
+            "mean_compute_ms": 1000 * stats["compute_s"] / calls,
+        }
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_gate(name):
+    with _gates_lock:
+        if name not in _gates:
+            _gates[name] = ModelGate(name, MAX_CONCURRENT_CALLS.get(name, 1))
+        return _gates[name]
+
+
+def scheduler_report():
+    """Threads attribués à chaque framework et statistiques de chaque modèle."""
+    tf_threads, torch_threads = thread_split()
+    with _gates_lock:
+        gates = dict(_gates)
+    return {
+        "cores": CPU_CORES,
+        "tensorflow_intra_op": tf_threads,
+        "torch_intra_op": torch_threads,
+        "models": {name: g.report() for name, g in gates.items()},
+    }
+
+
+class GatedModel:
+    """Modèle appelable dont les appels passent par la porte `name`."""
+
+    def __init__(self, name, model):
+        self.model = model
+        self.gate = get_gate(name)
+
+    def __call__(self, *args, **kwargs):
+        return self.gate.run(self.model, *args, **kwargs)
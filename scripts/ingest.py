@@ -0,0 +1,263 @@
+import bisect
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from scripts.pdf_backends import get_backend, is_pdf_bytes
+
+# ==============================================================================
+# INGESTION DES PDF EN UN SEUL PASSAGE
+# ==============================================================================
+# Chaque PDF est lu une seule fois (moteur PDF_BACKEND, PyPDF2 par défaut) et donne un document structuré :
+# texte complet (assemblé par join, identique à l'ancienne concaténation),
+# début de chaque page dans ce texte, marqueurs de questions "Q1(5)" avec leurs
+# points, et verdict de validation. Ce même objet sert aux vérifications
+# initiales (compare_documents) et au découpage en questions (split_into_questions).
+# Les derniers documents lus sont gardés en mémoire (clé : inode, taille, date
+# de modification ; sha256 pour un contenu en mémoire) : vérifications, index
+# du corrigé et notation ne relisent pas le fichier, même via un autre lien
+# physique (dossiers runs/ du magasin).
+
+INGEST_CACHE_SIZE = int(os.getenv("INGEST_CACHE_SIZE", "16"))
+
+# Tout "Q<n>" compte comme marqueur (comme l'ancien comptage pdfplumber) ;
+# les points "(<p>)" sont relevés quand ils suivent immédiatement
+QUESTION_MARKER_PATTERN = re.compile(r'Q(\d+)(?:\((\d+)\))?')
+
+
+@dataclass
+class QuestionMarker:
+    label: str             # "Q1(5)" ou "Q1"
+    key: str               # "Q1"
+    points: Optional[int]  # None si le marqueur n'a pas de points
+    offset: int            # position dans le texte complet
+    page: int              # numéro de page (0 = première)
+
+
+@dataclass
+class IngestedDocument:
+    path: str
+    text: str = ""
+    page_offsets: List[int] = field(default_factory=list)
+    markers: List[QuestionMarker] = field(default_factory=list)
+    error: Optional[str] = None
+    failed_pages: List[int] = field(default_factory=list)  # extraction abandonnée (délai)
+
+    @property
+    def page_count(self):
+        return len(self.page_offsets)
+
+    @property
+    def question_count(self):
+        """Nombre de marqueurs "Q<n>" (-1 si le PDF est illisible)."""
+        return -1 if self.error else len(self.markers)
+
+    @property
+    def scored_keys(self):
+        """Clés "Q1(5)" exploitables par split_into_questions, dans l'ordre."""
+        return [m.label for m in self.markers if m.points is not None]
+
+    def page_text(self, page):
+        end = self.page_offsets[page + 1] if page + 1 < self.page_count else len(self.text)
+        return self.text[self.page_offsets[page]:end]
+
+    def page_of(self, offset):
+        return max(0, bisect.bisect_right(self.page_offsets, offset) - 1)
+
+    @property
+    def first_line(self):
+        """Première ligne de la première page (None si vide)."""
+        if not self.page_count:
+            return None
+        lines = self.page_text(0).strip().splitlines()
+        return lines[0].strip() if lines else None
+
+    @property
+    def verdict(self):
+        """Liste des problèmes bloquants du document (vide = document exploitable)."""
+        if self.error:
+            return [f"PDF illisible : {self.error}"]
+        problems = []
+        if not self.text.strip():
+            problems.append("Aucun texte extractible (PDF scanné ?)")
+        elif not self.scored_keys:
+            problems.append("Aucune question au format Q1(5) détectée")
+        return problems
+
+    @property
+    def ok(self):
+        return not self.verdict
+
+    def questions(self):
+        from scripts.grading import split_into_questions
+        return split_into_questions(self.text)
+
+
+# --- Extraction parallèle par page (longues copies) ---
+# Au-delà de PDF_PARALLEL_MIN_PAGES pages, les pages sont réparties entre
+# PDF_EXTRACT_WORKERS processus (chacun ouvre le PDF une fois) puis remises dans
+# l'ordre. Une page dont l'extraction dure plus de PDF_PAGE_TIMEOUT_S (compté
+# depuis son démarrage dans un worker, pas depuis le début de la lecture) est
+# laissée vide (et notée dans failed_pages) au lieu de bloquer toute la
+# notation. Une page pas encore commencée est abandonnée quand plus aucune
+# page n'a démarré ni fini depuis PDF_PAGE_TIMEOUT_S (workers tous bloqués ou
+# incapables d'ouvrir le PDF).
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "24"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGE_TIMEOUT_S = float(os.getenv("PDF_PAGE_TIMEOUT_S", "20"))
+
+# Intervalle de vérification des délais par le processus parent
+_PAGE_POLL_S = 0.05
+
+_page_worker = None  # (moteur, document ouvert) dans chaque processus du pool
+_page_starts = None  # heure de démarrage de chaque page (mémoire partagée, 0 = pas commencée)
+
+
+def _init_page_worker(pdf_path, backend_name, page_starts=None):
+    global _page_worker, _page_starts
+    backend = get_backend(backend_name)
+    _page_worker = (backend, backend.open(pdf_path))
+    _page_starts = page_starts
+
+
+def _extract_page(index):
+    backend, document = _page_worker
+    if _page_starts is not None:
+        _page_starts[index] = time.time()
+    return backend.page_text(document, index)
+
+
+def _read_pages_parallel(pdf_path, page_count, backend, workers=PDF_EXTRACT_WORKERS,
+                         page_timeout_s=PDF_PAGE_TIMEOUT_S):
+    """(textes des pages dans l'ordre, indices des pages abandonnées)."""
+    import multiprocessing
+
+    pages, failed = [], []
+    # "spawn" : pas de fork d'un processus Streamlit contenant déjà des threads
+    context = multiprocessing.get_context("spawn")
+    page_starts = context.RawArray("d", page_count)
+    pool = context.Pool(
+        workers, initializer=_init_page_worker,
+        initargs=(pdf_path if is_pdf_bytes(pdf_path) else str(pdf_path), backend.name, page_starts)
+    )
+    try:
+        pending = [pool.apply_async(_extract_page, (i,)) for i in range(page_count)]
+        last_done = time.time()
+        for i, result in enumerate(pending):
+            while True:
+                result.wait(_PAGE_POLL_S)
+                if result.ready():
+                    pages.append(result.get())
+                    last_done = time.time()
+                    break
+                # Délai compté depuis le démarrage de la page dans son worker ;
+                # pas commencée : depuis la dernière page démarrée ou finie
+                started = page_starts[i] or max(last_done, max(page_starts))
+                if time.time() - started > page_timeout_s:
+                    pages.append("")
+                    failed.append(i)
+                    break
+    finally:
+        # Tue aussi les workers restés bloqués sur une page pathologique
+        pool.terminate()
+        pool.join()
+    return pages, failed
+
+
+def _read_pages(pdf_path, backend):
+    """(textes des pages dans l'ordre, indices des pages abandonnées)."""
+    document = backend.open(pdf_path)
+    try:
+        page_count = backend.page_count(document)
+        if PDF_EXTRACT_WORKERS < 2 or page_count < PDF_PARALLEL_MIN_PAGES:
+            return [backend.page_text(document, i) for i in range(page_count)], []
+    finally:
+        backend.close(document)
+    return _read_pages_parallel(pdf_path, page_count, backend)
+
+
+def build_document(pdf_path, pages):
+    """Assemble le document structuré à partir du texte de chaque page."""
+    offsets, position = [], 0
+    for page_text in pages:
+        offsets.append(position)
+        position += len(page_text)
+    text = "".join(pages)
+
+    markers = []
+    for m in QUESTION_MARKER_PATTERN.finditer(text):
+        markers.append(QuestionMarker(
+            label=m.group(0),
+            key=f"Q{m.group(1)}",
+            points=int(m.group(2)) if m.group(2) is not None else None,
+            offset=m.start(),
+            page=0,
+        ))
+    document = IngestedDocument(str(pdf_path), text, offsets, markers)
+    for marker in markers:
+        marker.page = document.page_of(marker.offset)
+    return document
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def ingest_pdf(pdf_path, backend=None):
+    """
+    Lit un PDF une seule fois (moteur `backend`, PDF_BACKEND par défaut) et
+    retourne son IngestedDocument. `pdf_path` peut aussi être le contenu du PDF
+    (bytes, upload gardé en mémoire). Ne lève pas : en cas d'échec, `error`
+    est renseigné et le texte est vide.
+    """
+    # Moteur inconnu ou non installé : erreur de configuration, on la laisse remonter
+    backend = get_backend(backend)
+    if is_pdf_bytes(pdf_path):
+        cache_key = ("sha256", hashlib.sha256(pdf_path).hexdigest(), backend.name)
+        label = f"<mémoire:{cache_key[1][:12]}>"
+    else:
+        label = str(pdf_path)
+        try:
+            stat = os.stat(pdf_path)
+            # Clé par inode : les liens physiques d'un même objet du magasin
+            # (runs/<id>/Etudiant.pdf, prof.pdf) partagent le document lu
+            cache_key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, backend.name)
+        except OSError as e:
+            return IngestedDocument(label, error=f"{type(e).__name__}: {e}")
+
+    with _cache_lock:
+        if cache_key in _cache:
+            _cache.move_to_end(cache_key)
+            return _cache[cache_key]
+
+    try:
+        pages, failed_pages = _read_pages(pdf_path, backend)
+        document = build_document(label, pages)
+        document.failed_pages = failed_pages
+        if failed_pages:
+            print(f"⚠️ {label} : pages ignorées (délai dépassé) : {[i + 1 for i in failed_pages]}")
+    except Exception as e:
+        return IngestedDocument(label, error=f"{type(e).__name__}: {e}")
+
+    with _cache_lock:
+        _cache[cache_key] = document
+        while len(_cache) > INGEST_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return document
+
+
+def compare_documents(student, prof):
+    """Avertissements des vérifications initiales (règles d'initial_checks)."""
+    if student.question_count == -1 or prof.question_count == -1:
+        return ["Impossible de lire correctement les fichiers PDF pour compter les questions."]
+    if student.question_count != prof.question_count:
+        return [
+            f"Attention : Le nombre de questions détectées diffère "
+            f"(Étudiant: {student.question_count}, Prof: {prof.question_count})."
+        ]
+    return []
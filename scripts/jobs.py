@@ -0,0 +1,191 @@
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# ==============================================================================
+# FILE DE NOTATION EN ARRIÈRE-PLAN
+# ==============================================================================
+# Les notations tournent dans un pool de processus workers (chacun charge ses
+# modèles une seule fois, à son démarrage). L'UI soumet un job (copie, corrigé)
+# puis interroge son statut : le thread Streamlit n'est plus bloqué et le débit
+# suit le nombre de cœurs au lieu d'être limité par le GIL.
+
+# Nombre de workers (0 = notation synchrone dans le processus Streamlit)
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", "0"))
+# Durée de conservation des jobs terminés (s)
+GRADING_JOB_TTL_S = float(os.getenv("GRADING_JOB_TTL_S", "3600"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# --- Côté worker ---
+_worker_registry = None
+
+
+def _init_worker():
+    """Initialiseur du processus worker : charge une fois les modèles nécessaires."""
+    global _worker_registry
+    from scripts.grading import required_models
+    from scripts.models import ModelRegistry
+
+    _worker_registry = ModelRegistry()
+    for name in required_models():
+        _worker_registry.get(name)
+
+
+_worker_warmed = False
+
+
+def _warmup_job(hold_s):
+    """
+    Job factice : appelle une fois chaque modèle du worker (traçage des graphes,
+    init paresseuse), puis l'occupe `hold_s` secondes pour que les jobs suivants
+    du même lot partent vers les autres workers. Retourne le pid du worker.
+    """
+    global _worker_warmed
+    if not _worker_warmed:
+        from scripts.grading import required_models
+        from scripts.warmup import _dummy_inference
+
+        for name in required_models():
+            _dummy_inference(name, _worker_registry.get(name), _worker_registry)
+        _worker_warmed = True
+    time.sleep(hold_s)
+    return os.getpid()
+
+
+def _run_grading_job(etudiant_pdf_path, prof_pdf_path):
+    from scripts.grading import grade_submission
+
+    try:
+        return {"ok": True, "result": grade_submission(etudiant_pdf_path, prof_pdf_path, _worker_registry.get)}
+    except Exception as e:
+        # Les exceptions sont renvoyées en texte : certaines ne sont pas picklables
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+
+
+# --- Côté UI ---
+class GradingJobQueue:
+    """Soumission de notations à un pool de workers et suivi de leur statut."""
+
+    def __init__(self, workers=GRADING_WORKERS or 1, job_ttl_s=GRADING_JOB_TTL_S):
+        self.workers = workers
+        self.job_ttl_s = job_ttl_s
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        # "spawn" : pas de fork d'un processus Streamlit contenant déjà des threads
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def submit(self, etudiant_pdf_path, prof_pdf_path):
+        job_id = uuid.uuid4().hex
+        args = (_run_grading_job, str(etudiant_pdf_path), str(prof_pdf_path))
+        try:
+            future = self._executor.submit(*args)
+        except BrokenProcessPool:
+            # Un worker est mort (OOM...) : le pool est inutilisable, on en recrée un
+            self._executor = self._new_executor()
+            future = self._executor.submit(*args)
+        with self._lock:
+            self._purge()
+            self._jobs[job_id] = {"future": future, "submitted": time.time(), "finished": None}
+        future.add_done_callback(lambda _: self._mark_finished(job_id))
+        return job_id
+
+    def _mark_finished(self, job_id):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["finished"] = time.time()
+
+    def _purge(self):
+        now = time.time()
+        expired = [j for j, job in self._jobs.items()
+                   if job["finished"] and now - job["finished"] > self.job_ttl_s]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def status(self, job_id):
+        """queued | running | done | failed (None si le job est inconnu ou expiré)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future = job["future"]
+        if not future.done():
+            return RUNNING if future.running() else QUEUED
+        if future.exception() is not None or not future.result()["ok"]:
+            return FAILED
+        return DONE
+
+    def result(self, job_id):
+        """Résultat de grade_submission() pour un job terminé."""
+        with self._lock:
+            job = self._jobs[job_id]
+        outcome = job["future"].result()
+        if not outcome["ok"]:
+            raise RuntimeError(outcome["error"])
+        return outcome["result"]
+
+    def error(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or not job["future"].done():
+            return None
+        exc = job["future"].exception()
+        if exc is not None:
+            # Worker mort (OOM, crash natif...)
+            return f"{type(exc).__name__}: {exc}"
+        return job["future"].result().get("error")
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs)
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job_id in jobs:
+            s = self.status(job_id)
+            if s:
+                counts[s] += 1
+        return {"workers": self.workers, **counts}
+
+    def warm_up(self, on_progress=None, hold_s=0.2):
+        """
+        Démarre et préchauffe chaque worker (un job factice par worker, répété
+        jusqu'à ce que tous aient répondu). Bloquant. `on_progress(pids)` est
+        appelé à chaque worker prêt. Retourne les pids des workers prêts.
+        """
+        ready = set()
+        while len(ready) < self.workers:
+            futures = [self._executor.submit(_warmup_job, hold_s) for _ in range(self.workers)]
+            for future in futures:
+                pid = future.result()
+                if pid not in ready:
+                    ready.add(pid)
+                    if on_progress is not None:
+                        on_progress(sorted(ready))
+        return sorted(ready)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# File préchauffée au démarrage (scripts/warmup.py), réutilisée par l'UI
+_shared_queue = None
+
+
+def set_shared_job_queue(queue):
+    global _shared_queue
+    _shared_queue = queue
+
+
+def shared_job_queue():
+    return _shared_queue
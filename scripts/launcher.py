@@ -0,0 +1,251 @@
+import argparse
+import gc
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import time
+
+# ==============================================================================
+# LANCEUR FORK-SERVER : MODÈLES CHARGÉS UNE FOIS, PARTAGÉS EN COPY-ON-WRITE
+# ==============================================================================
+# Lancer plusieurs processus Streamlit par VM fait payer à chacun le chargement
+# complet des modèles. Ici le processus parent charge les modèles une seule
+# fois, puis forke N serveurs Streamlit (ports consécutifs) : les poids, en
+# lecture seule, restent dans des pages partagées (copy-on-write) et chaque
+# enfant récupère le registre via scripts.models.shared_registry().
+# Le parent relance un enfant mort et affiche périodiquement la mémoire unique
+# (USS) et proportionnelle (PSS) de chaque enfant, lue dans smaps_rollup.
+#
+# Sûreté du fork : TensorFlow ne supporte pas un enfant forké après
+# l'initialisation de son runtime (pools de threads), et torch avec libgomp a
+# le même risque si le parent a déjà utilisé OpenMP. Donc :
+#   - seuls les modèles de LAUNCHER_PRELOAD sont préchargés (par défaut le
+#     zero-shot torch, de loin le plus lourd) ; USE (TensorFlow) ne l'est
+#     jamais et chaque enfant le charge lui-même ;
+#   - le parent ne fait aucune inférence avant de forker ;
+#   - chaque enfant fait une inférence de contrôle sur les modèles hérités
+#     avant d'être annoncé : en cas d'échec ou de blocage
+#     (LAUNCHER_SMOKE_TIMEOUT_S), le parent libère ses modèles et lance les
+#     serveurs dans des interpréteurs neufs (sans partage).
+# Avec GRADING_WORKERS > 0, les modèles vivent dans les pools de notation :
+# rien n'est préchargé.
+#
+# Usage :
+#   python -m scripts.launcher --workers 3 --port 8080
+#   MODEL_MMAP_WEIGHTS=1 python -m scripts.launcher ...   (poids safetensors projetés)
+
+LAUNCHER_WORKERS = int(os.getenv("LAUNCHER_WORKERS", "2"))
+LAUNCHER_REPORT_INTERVAL_S = float(os.getenv("LAUNCHER_REPORT_INTERVAL_S", "300"))
+LAUNCHER_PRELOAD = os.getenv("LAUNCHER_PRELOAD", "zero_shot")
+LAUNCHER_SMOKE_TIMEOUT_S = float(os.getenv("LAUNCHER_SMOKE_TIMEOUT_S", "120"))
+# Modèles dont le runtime ne survit pas à un fork
+FORK_UNSAFE_MODELS = {"use"}
+
+
+def process_memory(pid="self"):
+    """RSS, PSS et USS (Mo) d'un processus, depuis /proc/<pid>/smaps_rollup."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        "rss_mb": round(fields.get("Rss", 0.0), 1),
+        "pss_mb": round(fields.get("Pss", 0.0), 1),
+        "uss_mb": round(fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0), 1),
+    }
+
+
+def memory_report(children):
+    """Mémoire du parent et de chaque enfant {port: pid}."""
+    report = {"parent": process_memory(os.getpid())}
+    for port, pid in children.items():
+        report[f"worker:{port}"] = {"pid": pid, **(process_memory(pid) or {})}
+    return report
+
+
+def fork_preload_names():
+    """Modèles nécessaires à la notation, demandés dans LAUNCHER_PRELOAD et sûrs au fork."""
+    from scripts.grading import required_models
+
+    wanted = [n.strip() for n in LAUNCHER_PRELOAD.split(",") if n.strip()]
+    names = [n for n in wanted if n in required_models()]
+    unsafe = [n for n in names if n in FORK_UNSAFE_MODELS]
+    if unsafe:
+        print(f"⚠️ Non préchargés (runtime incompatible avec fork) : {', '.join(unsafe)}")
+    return [n for n in names if n not in FORK_UNSAFE_MODELS]
+
+
+def preload_models(names):
+    """Charge les modèles dans le parent (sans inférence) et les expose aux futurs enfants."""
+    from scripts.models import ModelRegistry, set_shared_registry
+
+    # Le parent ne sert aucune requête : pas de déchargement des modèles
+    # inactifs chez lui (les enfants rétablissent MODEL_IDLE_TIMEOUT_S)
+    registry = ModelRegistry(idle_timeout_s=0)
+    for name in names:
+        start = time.perf_counter()
+        registry.get(name)
+        print(f"✔ {name} chargé en {time.perf_counter() - start:.1f} s")
+    set_shared_registry(registry)
+    # Les objets déjà chargés sortent du suivi du GC : ses passages ne
+    # réécrivent plus leurs en-têtes, donc ne dupliquent pas leurs pages
+    gc.collect()
+    gc.freeze()
+    return registry
+
+
+def _run_streamlit(port, address, script):
+    from streamlit.web import cli as stcli
+
+    sys.argv = ["streamlit", "run", script,
+                f"--server.port={port}", f"--server.address={address}"]
+    sys.exit(stcli.main())
+
+
+def _smoke_inference(names):
+    """Inférence de contrôle, dans l'enfant, sur les modèles hérités du parent."""
+    from scripts.models import shared_registry
+    from scripts.warmup import _dummy_inference
+
+    registry = shared_registry()
+    for name in names:
+        _dummy_inference(name, registry.get(name), registry)
+
+
+def _fork_worker(port, address, script, smoke_names=(), smoke_timeout_s=LAUNCHER_SMOKE_TIMEOUT_S):
+    """Forke un serveur ; retourne son pid, ou None si l'inférence de contrôle a échoué."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Enfant : ne revient jamais dans la boucle du parent
+        os.close(read_fd)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        from scripts.models import MODEL_IDLE_TIMEOUT_S, shared_registry
+        if shared_registry() is not None:
+            shared_registry().idle_timeout_s = MODEL_IDLE_TIMEOUT_S
+        try:
+            try:
+                _smoke_inference(smoke_names)
+            except BaseException as e:
+                os.write(write_fd, f"{type(e).__name__}: {e}".encode("utf-8")[:1000])
+                os._exit(1)
+            os.write(write_fd, b"ok")
+            os.close(write_fd)
+            _run_streamlit(port, address, script)
+        finally:
+            os._exit(1)
+
+    os.close(write_fd)
+    ready, _, _ = select.select([read_fd], [], [], smoke_timeout_s)
+    message = os.read(read_fd, 1024) if ready else b""
+    os.close(read_fd)
+    if message == b"ok":
+        checked = f", inférence de contrôle OK ({', '.join(smoke_names)})" if smoke_names else ""
+        print(f"🚀 Worker Streamlit pid={pid} sur le port {port}{checked}")
+        return pid
+
+    reason = message.decode("utf-8", "replace") or f"pas de réponse en {smoke_timeout_s:.0f} s"
+    print(f"❌ Inférence de contrôle échouée dans l'enfant forké (port {port}) : {reason}")
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    os.waitpid(pid, 0)
+    return None
+
+
+def _spawn_worker(port, address, script):
+    """Serveur dans un interpréteur neuf (aucun modèle hérité)."""
+    process = subprocess.Popen([sys.executable, "-m", "streamlit", "run", script,
+                                f"--server.port={port}", f"--server.address={address}"])
+    print(f"🚀 Worker Streamlit pid={process.pid} sur le port {port} (interpréteur neuf)")
+    return process.pid
+
+
+def serve(workers=LAUNCHER_WORKERS, port=8080, address="0.0.0.0", script="app.py",
+          report_interval_s=LAUNCHER_REPORT_INTERVAL_S):
+    from scripts.framework_workers import FRAMEWORK_ISOLATION
+    from scripts.jobs import GRADING_WORKERS
+    from scripts.models import MODEL_SERVER_URL, set_shared_registry
+
+    smoke_names = []
+    registry = None
+    if MODEL_SERVER_URL or FRAMEWORK_ISOLATION or GRADING_WORKERS > 0:
+        print("⚠️ Modèles hors processus (serveur, sous-processus ou pool de notation) : "
+              "rien à partager, préchargement ignoré")
+    else:
+        smoke_names = fork_preload_names()
+        if smoke_names:
+            registry = preload_models(smoke_names)
+
+    forking = True
+
+    def _start_worker(worker_port):
+        nonlocal forking
+        if forking:
+            pid = _fork_worker(worker_port, address, script, smoke_names)
+            if pid is not None:
+                return pid
+            # Modèles hérités inutilisables : plus de fork, chaque serveur charge les siens
+            print("⚠️ Partage des modèles par fork désactivé : serveurs lancés dans des interpréteurs neufs")
+            forking = False
+            set_shared_registry(None)
+            for name in smoke_names:
+                registry.unload(name)
+            gc.unfreeze()
+        return _spawn_worker(worker_port, address, script)
+
+    children = {port + i: _start_worker(port + i) for i in range(workers)}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    next_report = time.monotonic() + report_interval_s
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            dead_port = next((p for p, c in children.items() if c == pid), None)
+            if dead_port is not None:
+                del children[dead_port]
+                if not stopping:
+                    print(f"⚠️ Worker du port {dead_port} terminé (statut {status}) : relance")
+                    children[dead_port] = _start_worker(dead_port)
+            continue
+        if report_interval_s and time.monotonic() >= next_report:
+            print(json.dumps(memory_report(children), ensure_ascii=False))
+            next_report = time.monotonic() + report_interval_s
+        time.sleep(0.5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lanceur fork-server de l'application")
+    parser.add_argument("--workers", type=int, default=LAUNCHER_WORKERS)
+    parser.add_argument("--port", type=int, default=8080, help="Port du premier worker (les suivants : +1, +2...)")
+    parser.add_argument("--address", default="0.0.0.0")
+    parser.add_argument("--script", default="app.py")
+    parser.add_argument("--report-interval", type=float, default=LAUNCHER_REPORT_INTERVAL_S)
+    args = parser.parse_args()
+    serve(args.workers, args.port, args.address, args.script, args.report_interval)
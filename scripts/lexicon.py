@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from scripts.preprocess import PreparedAnswer, fold_accents, lower_same_length, prepare_answer
+
+# ==============================================================================
+# LEXIQUES COMPILÉS (CONCEPTS + AUTEURS EN UN SEUL PASSAGE)
+# ==============================================================================
+# Les lexiques (management_concepts.json, management_authors.json) sont compilés
+# une seule fois en un arbre de préfixes (trie) sur le texte en minuscules.
+# Le texte est parcouru une fois, depuis chaque frontière de mot : tous les
+# concepts et tous les auteurs présents sont trouvés ensemble, et le coût ne
+# dépend presque pas de la taille des lexiques (un regex par entrée coûtait
+# un passage par concept et par auteur, recompilé dès que le cache de `re`
+# débordait).
+# Le texte est prétraité une fois par réponse (scripts/preprocess.py) : les
+# minuscules et les frontières de mots sont partagées avec les autres étapes.
+# Résultats identiques aux anciens regex :
+#   concept : \b(?:verbe...)\w*\b | \b(?:l')?concept\b   (verbe = préfixe de mot)
+#   auteur  : \b(?:variante...)\b
+# Comparatif : python -m scripts.bench_lexicon
+
+# Comparer aussi sans accents ("strategie" = "stratégie") ? Désactivé par
+# défaut : mêmes concepts trouvés qu'avant.
+LEXICON_FOLD_ACCENTS = os.getenv("LEXICON_FOLD_ACCENTS", "0").lower() in ("1", "true", "yes")
+# Nombre de couples de lexiques compilés gardés en mémoire
+LEXICON_CACHE_SIZE = 4
+
+_WORD_TAIL = re.compile(r"\w*")
+
+# Types d'entrées du trie
+_VERB, _CONCEPT, _AUTHOR = 0, 1, 2
+
+
+class LexiconMatcher:
+    """Concepts et auteurs compilés dans un seul trie."""
+
+    def __init__(self, concepts, auteurs, fold=LEXICON_FOLD_ACCENTS):
+        self.fold = fold
+        self.concepts = list(concepts)
+        self.auteurs = list(auteurs)
+        self._root = {}
+        for target, (concept, verbs) in enumerate(concepts.items()):
+            for order, verb in enumerate(verbs):
+                self._add(verb, (_VERB, target, order))
+            self._add(concept, (_CONCEPT, target, 0))
+        for target, variations in enumerate(auteurs.values()):
+            for variation in variations:
+                self._add(variation, (_AUTHOR, target, 0))
+
+    def _add(self, word, entry):
+        node = self._root
+        word = lower_same_length(word)
+        for c in fold_accents(word) if self.fold else word:
+            node = node.setdefault(c, {})
+        # Clé None : entrées qui se terminent sur ce nœud
+        node.setdefault(None, []).append(entry)
+
+    def _walk(self, low, start, boundaries):
+        """Entrées du trie lues à partir de `start` : [(entrée, fin du match)]."""
+        hits = []
+        node = self._root
+        i, n = start, len(low)
+        while True:
+            entries = node.get(None)
+            if entries:
+                for entry in entries:
+                    end = i
+                    if entry[0] == _VERB:
+                        # Préfixe de mot : le match va jusqu'à la fin du mot
+                        end = _WORD_TAIL.match(low, i).end()
+                    if end in boundaries:
+                        hits.append((entry, end))
+            if i >= n:
+                return hits
+            node = node.get(low[i])
+            if node is None:
+                return hits
+            i += 1
+
+    def scan(self, answer):
+        """
+        Un seul parcours du texte (str ou PreparedAnswer déjà prétraité).
+        Retourne (concepts, auteurs) au format de find_management_concepts /
+        find_management_authors.
+        """
+        if not isinstance(answer, PreparedAnswer):
+            answer = prepare_answer(answer)
+        text = answer.text
+        low = answer.folded if self.fold else answer.lowered
+        boundaries = answer.boundaries
+        starts = sorted(p for p in boundaries if p < len(low))
+        hits_at = {}
+        for p in starts:
+            hits = self._walk(low, p, boundaries)
+            if hits:
+                hits_at[p] = hits
+
+        found_concepts = {concept: {'found': False, 'verbs': []} for concept in self.concepts}
+        found_authors = {author: False for author in self.auteurs}
+        # Matches sans chevauchement par concept, de gauche à droite (comme findall)
+        concept_end = {}
+        for p in starts:
+            hits = hits_at.get(p, [])
+            elided = hits_at.get(p + 2, []) if low.startswith("l'", p) else []
+            if not hits and not elided:
+                continue
+            # Pour chaque concept : un verbe (dans l'ordre du lexique), sinon
+            # "l'concept", sinon le concept seul — l'ordre des alternatives du regex
+            best = {}
+            for (kind, target, order), end in hits:
+                if kind == _AUTHOR:
+                    found_authors[self.auteurs[target]] = True
+                elif kind == _VERB:
+                    if target not in best or best[target][0] > order:
+                        best[target] = (order, end)
+            for (kind, target, _), end in elided:
+                if kind == _CONCEPT and target not in best:
+                    best[target] = (float("inf"), end)
+            for (kind, target, _), end in hits:
+                if kind == _CONCEPT and target not in best:
+                    best[target] = (float("inf"), end)
+            for target, (_, end) in best.items():
+                if p < concept_end.get(target, 0):
+                    continue
+                concept_end[target] = end
+                entry = found_concepts[self.concepts[target]]
+                entry['found'] = True
+                entry['verbs'].append(text[p:end])
+        return found_concepts, found_authors
+
+
+_matchers = OrderedDict()
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(concepts, auteurs):
+    """
+    Matcher compilé pour ces lexiques (mémorisé par objet : les lexiques chargés
+    une fois sont réutilisés tels quels ; un nouveau chargement recompile).
+    """
+    key = (id(concepts), id(auteurs), LEXICON_FOLD_ACCENTS)
+    with _matchers_lock:
+        cached = _matchers.get(key)
+        # Les dictionnaires sont gardés dans le cache : leurs id ne peuvent pas être réutilisés
+        if cached is not None and cached[0] is concepts and cached[1] is auteurs:
+            _matchers.move_to_end(key)
+            return cached[2]
+    matcher = LexiconMatcher(concepts, auteurs)
+    with _matchers_lock:
+        _matchers[key] = (concepts, auteurs, matcher)
+        while len(_matchers) > LEXICON_CACHE_SIZE:
+            _matchers.popitem(last=False)
+    return matcher
+
+
+def match_lexicon(answer, concepts, auteurs):
+    """Concepts et auteurs présents dans `answer` (str ou PreparedAnswer), en un seul parcours."""
+    return get_matcher(concepts, auteurs).scan(answer)
+
+
+_EMPTY = {}
+
+
+def find_concepts(text, concepts):
+    return get_matcher(concepts, _EMPTY).scan(text)[0]
+
+
+def find_authors(text, auteurs):
+    return get_matcher(_EMPTY, auteurs).scan(text)[1]
+
+
+# ==============================================================================
+# SERVICE DE LEXIQUES VERSIONNÉS, RECHARGÉS À CHAUD
+# ==============================================================================
+# Les fichiers JSON sont lus une fois (chemins relatifs à ce module, plus au
+# dossier courant), compilés, et publiés ensemble dans un LexiconSnapshot
+# portant une version de contenu. Un thread surveille les fichiers toutes les
+# LEXICON_RELOAD_INTERVAL_S secondes : à la moindre modification, les lexiques
+# sont relus et recompilés à part, puis le snapshot est remplacé d'un coup.
+# Une notation en cours garde le snapshot qu'elle a pris au départ.
+# Un fichier invalide (JSON en cours d'écriture...) ou absent (sauvegarde qui
+# supprime puis recrée) laisse l'ancien en place.
+# La version est enregistrée avec chaque note et invalide l'index des corrigés.
+
+LEXICON_DIR = Path(os.getenv("LEXICON_DIR", Path(__file__).resolve().parent))
+CONCEPTS_PATH = LEXICON_DIR / "management_concepts.json"
+AUTHORS_PATH = LEXICON_DIR / "management_authors.json"
+# 0 = pas de surveillance (rechargement manuel avec reload_lexicon())
+LEXICON_RELOAD_INTERVAL_S = float(os.getenv("LEXICON_RELOAD_INTERVAL_S", "5"))
+
+
+def lexicon_fingerprint(concepts, auteurs):
+    """Empreinte des lexiques : un changement de lexique invalide les concepts indexés."""
+    payload = json.dumps([concepts, auteurs], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class LexiconSnapshot:
+    version: str                  # empreinte du contenu (lexicon_fingerprint)
+    concepts: dict
+    auteurs: dict
+    matcher: LexiconMatcher
+    stamp: tuple                  # (taille, mtime) des fichiers lus
+    loaded_at: float
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        return None
+
+
+def _read_json(path, allow_missing=False):
+    if not os.path.exists(path):
+        if not allow_missing:
+            raise FileNotFoundError(f"Lexique introuvable : {path}")
+        print(f"⚠️ Lexique introuvable : {path}")
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _load_snapshot(concepts_path, authors_path, allow_missing=False):
+    stamp = (_file_stamp(concepts_path), _file_stamp(authors_path))
+    concepts = _read_json(concepts_path, allow_missing)
+    auteurs = _read_json(authors_path, allow_missing)
+    return LexiconSnapshot(
+        version=lexicon_fingerprint(concepts, auteurs),
+        concepts=concepts,
+        auteurs=auteurs,
+        # Compilé avant publication : les notations ne compilent jamais
+        matcher=get_matcher(concepts, auteurs),
+        stamp=stamp,
+        loaded_at=time.time(),
+    )
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_watcher = None
+# Fichiers dans un état déjà refusé : pas de nouvel essai avant leur prochaine modification
+_rejected_stamp = None
+
+
+def reload_lexicon(force=False, concepts_path=CONCEPTS_PATH, authors_path=AUTHORS_PATH):
+    """
+    Relit les lexiques si les fichiers ont changé (ou si `force`) et publie le
+    nouveau snapshot. Retourne le snapshot courant.
+    """
+    global _snapshot, _rejected_stamp
+    with _snapshot_lock:
+        current = _snapshot
+        stamp = (_file_stamp(concepts_path), _file_stamp(authors_path))
+        if current is not None and not force and stamp in (current.stamp, _rejected_stamp):
+            return current
+        try:
+            # Fichier absent toléré au premier chargement seulement (lexique vide,
+            # comme avant) ; ensuite, il est refusé comme un JSON invalide
+            snapshot = _load_snapshot(concepts_path, authors_path, allow_missing=current is None)
+        except (OSError, ValueError) as e:
+            if current is None:
+                raise
+            _rejected_stamp = stamp
+            print(f"⚠️ Lexiques non rechargés (version {current.version} conservée) : {e}")
+            return current
+        if current is None or snapshot.version != current.version:
+            print(f"📚 Lexiques version {snapshot.version} : "
+                  f"{len(snapshot.concepts)} concepts, {len(snapshot.auteurs)} auteurs")
+        # Remplacement atomique : les lecteurs voient l'ancien ou le nouveau snapshot
+        _snapshot = snapshot
+        return snapshot
+
+
+def _watch_loop(interval_s):
+    while True:
+        time.sleep(interval_s)
+        try:
+            reload_lexicon()
+        except Exception as e:
+            print(f"⚠️ Surveillance des lexiques : {e}")
+
+
+def start_lexicon_watcher(interval_s=LEXICON_RELOAD_INTERVAL_S):
+    """Démarre (une fois par processus) la surveillance des fichiers de lexiques."""
+    global _watcher
+    with _snapshot_lock:
+        if _watcher is None and interval_s > 0:
+            _watcher = threading.Thread(target=_watch_loop, args=(interval_s,),
+                                        name="lexicon-watch", daemon=True)
+            _watcher.start()
+    return _watcher
+
+
+def current_lexicon():
+    """Snapshot courant des lexiques (chargé au premier appel, puis surveillé)."""
+    snapshot = _snapshot
+    if snapshot is None:
+        snapshot = reload_lexicon()
+        start_lexicon_watcher()
+    return snapshot
@@ -0,0 +1,217 @@
+import argparse
+import base64
+import http.client
+import json
+import os
+import socket
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import numpy as np
+
+# ==============================================================================
+# SERVEUR DE MODÈLES PARTAGÉ
+# ==============================================================================
+# Un processus séparé possède les modèles (USE, zero-shot) et expose :
+#   POST /embed      {"texts": [...]}                          -> matrice float32
+#   POST /zero_shot  {"sequences": [...], "labels": [...]}     -> résultats pipeline
+#   GET  /health     état des modèles
+# sur localhost (HTTP) ou sur une socket Unix. Plusieurs workers Streamlit
+# partagent ainsi un seul jeu de poids, et redémarrer l'UI ne recharge rien.
+#
+# Serveur :  python -m scripts.model_server --port 8765 [--preload]
+#            python -m scripts.model_server --socket /tmp/edumanager-models.sock
+# Client  :  MODEL_SERVER_URL=http://127.0.0.1:8765  (ou unix:///tmp/edumanager-models.sock)
+
+MODEL_SERVER_URL = os.getenv("MODEL_SERVER_URL", "")
+MODEL_SERVER_TIMEOUT_S = float(os.getenv("MODEL_SERVER_TIMEOUT_S", "300"))
+
+
+def _encode_array(array):
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def _decode_array(payload):
+    data = np.frombuffer(base64.b64decode(payload["data"]), dtype=np.float32)
+    return data.reshape(payload["shape"])
+
+
+# ==============================================================================
+# SERVEUR
+# ==============================================================================
+
+class _ModelRequestHandler(BaseHTTPRequestHandler):
+    registry = None  # ModelRegistry partagé, fixé par serve()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/health":
+            from scripts.batching import batching_report
+            from scripts.inference import scheduler_report
+            self._send_json(200, {
+                "status": "ok",
+                "models": self.registry.memory_report(),
+                "batching": batching_report(),
+                "scheduler": scheduler_report(),
+            })
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+            if self.path == "/embed":
+                embeddings = self.registry.get("use")(request["texts"])
+                embeddings = embeddings.numpy() if hasattr(embeddings, "numpy") else embeddings
+                self._send_json(200, {"embeddings": _encode_array(embeddings)})
+            elif self.path == "/zero_shot":
+                results = self.registry.get("zero_shot")(
+                    request["sequences"], request["labels"],
+                    batch_size=request.get("batch_size") or 1,
+                )
+                if isinstance(results, dict):
+                    results = [results]
+                self._send_json(200, {"results": [
+                    {"labels": r["labels"], "scores": [float(s) for s in r["scores"]]} for r in results
+                ]})
+            else:
+                self._send_json(404, {"error": "not found"})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def address_string(self):
+        # Socket Unix : pas d'adresse IP cliente
+        return self.client_address[0] if self.client_address else "unix"
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(host="127.0.0.1", port=8765, socket_path=None, preload=False, registry=None):
+    from scripts.models import LOCAL_LOADERS, ModelRegistry
+
+    registry = registry or ModelRegistry(LOCAL_LOADERS)
+    if preload:
+        registry.get("use")
+        registry.get("zero_shot")
+    handler = type("ModelRequestHandler", (_ModelRequestHandler,), {"registry": registry})
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = _ThreadingUnixHTTPServer(socket_path, handler)
+        print(f"🧠 Serveur de modèles prêt sur unix://{socket_path}")
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        print(f"🧠 Serveur de modèles prêt sur http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+# ==============================================================================
+# CLIENT (mêmes interfaces que les modèles locaux)
+# ==============================================================================
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ModelServerClient:
+    def __init__(self, url=MODEL_SERVER_URL, timeout=MODEL_SERVER_TIMEOUT_S):
+        self.url = urlparse(url)
+        self.timeout = timeout
+        # Une connexion par thread (sessions Streamlit concurrentes)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.url.scheme == "unix":
+                conn = _UnixHTTPConnection(self.url.path, self.timeout)
+            else:
+                conn = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body else {}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = json.loads(response.read() or b"{}")
+                break
+            except (ConnectionError, http.client.HTTPException, OSError):
+                # Connexion fermée par le serveur : on en rouvre une et on réessaie une fois
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(f"Serveur de modèles ({path}) : {data.get('error', response.status)}")
+        return data
+
+    def health(self):
+        return self.request("GET", "/health")
+
+
+class RemoteUseModel:
+    """Remplace le modèle USE : use_model([textes]) -> matrice numpy."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __call__(self, texts):
+        return _decode_array(self.client.request("POST", "/embed", {"texts": list(texts)})["embeddings"])
+
+
+class RemoteZeroShot:
+    """Remplace le pipeline zero-shot : zero_shot(phrases, labels, batch_size=...)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __call__(self, sequences, candidate_labels, batch_size=None):
+        single = isinstance(sequences, str)
+        results = self.client.request("POST", "/zero_shot", {
+            "sequences": [sequences] if single else list(sequences),
+            "labels": list(candidate_labels),
+            "batch_size": batch_size,
+        })["results"]
+        return results[0] if single else results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur de modèles partagé (USE + zero-shot)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", default=None, help="Chemin d'une socket Unix (au lieu de HTTP)")
+    parser.add_argument("--preload", action="store_true", help="Charger les modèles avant d'écouter")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.socket, args.preload)
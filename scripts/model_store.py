@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from scripts.paths import MODELS_DIR
+
+# ==============================================================================
+# MAGASIN DE MODÈLES HORS LIGNE (VÉRIFIÉ PAR CHECKSUM)
+# ==============================================================================
+# models/manifest.json liste les modèles (id, révision). `prefetch` les télécharge
+# une fois (au build de l'image Docker) dans MODEL_STORE_DIR et écrit un fichier
+# de verrouillage avec la révision résolue et le sha256 de chaque fichier.
+# Avec MODEL_STORE_OFFLINE=1, les modèles ne sont chargés QUE depuis ce magasin :
+# aucun téléchargement à l'exécution, et une erreur claire si un artefact manque.
+#
+# Usage :
+#   python -m scripts.model_store prefetch
+#   python -m scripts.model_store verify [--full]
+
+MANIFEST_PATH = Path(os.getenv("MODEL_MANIFEST", MODELS_DIR / "manifest.json"))
+MODEL_STORE_DIR = Path(os.getenv("MODEL_STORE_DIR", MODELS_DIR / "store"))
+LOCK_PATH = MODEL_STORE_DIR / "manifest.lock.json"
+MODEL_STORE_OFFLINE = os.getenv("MODEL_STORE_OFFLINE", "0") in ("1", "true", "yes")
+
+
+class ModelStoreError(RuntimeError):
+    """Artefact de modèle absent ou corrompu dans le magasin hors ligne."""
+
+
+def load_manifest(path=MANIFEST_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["models"]
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(4 * 1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _file_table(root):
+    """{chemin relatif: {'sha256', 'size'}} de tous les fichiers sous `root`."""
+    table = {}
+    for path in sorted(Path(root).rglob("*")):
+        rel = path.relative_to(root)
+        # Métadonnées internes de huggingface_hub, réécrites à chaque téléchargement
+        if path.is_file() and rel.parts[0] != ".cache":
+            table[str(rel)] = {"sha256": _sha256(path), "size": path.stat().st_size}
+    return table
+
+
+def _model_dir(name):
+    return MODEL_STORE_DIR / name
+
+
+# ==============================================================================
+# PREFETCH (build de l'image)
+# ==============================================================================
+
+def _prefetch_hf(name, spec):
+    from huggingface_hub import HfApi, snapshot_download
+
+    # Résolution de la révision (branche -> commit) pour un build reproductible
+    revision = HfApi().model_info(spec["id"], revision=spec.get("revision")).sha
+    snapshot_download(
+        repo_id=spec["id"],
+        revision=revision,
+        local_dir=_model_dir(name),
+        allow_patterns=spec.get("allow_patterns"),
+    )
+    return revision
+
+
+def _prefetch_tfhub(name, spec):
+    target = _model_dir(name)
+    download_cache = MODEL_STORE_DIR / ".tfhub_download"
+    os.environ["TFHUB_CACHE_DIR"] = str(download_cache)
+    import tensorflow_hub as hub
+
+    resolved = Path(hub.resolve(spec["id"]))
+    if target.exists():
+        shutil.rmtree(target)
+    shutil.copytree(resolved, target)
+    # Le SavedModel est copié dans le magasin : le cache de téléchargement ne sert plus
+    shutil.rmtree(download_cache, ignore_errors=True)
+    return spec.get("revision", "")
+
+
+def prefetch(names=None):
+    """Télécharge les modèles du manifeste et écrit le fichier de verrouillage."""
+    manifest = load_manifest()
+    lock = read_lock() or {}
+    MODEL_STORE_DIR.mkdir(parents=True, exist_ok=True)
+
+    for name, spec in manifest.items():
+        if names and name not in names:
+            continue
+        print(f"⬇️  {name} : {spec['id']}")
+        if spec["kind"] == "hf":
+            revision = _prefetch_hf(name, spec)
+        elif spec["kind"] == "tfhub":
+            revision = _prefetch_tfhub(name, spec)
+        else:
+            raise ModelStoreError(f"Type de modèle inconnu pour {name} : {spec['kind']}")
+
+        files = _file_table(_model_dir(name))
+        # Checksums attendus éventuellement figés dans le manifeste
+        for rel, expected in spec.get("sha256", {}).items():
+            if files.get(rel, {}).get("sha256") != expected:
+                raise ModelStoreError(f"{name}/{rel} : checksum inattendu après téléchargement")
+        lock[name] = {"id": spec["id"], "kind": spec["kind"], "revision": revision, "files": files}
+        print(f"   ✔ {len(files)} fichiers, {sum(f['size'] for f in files.values()) / 1e6:.0f} Mo")
+
+    with open(LOCK_PATH, "w", encoding="utf-8") as f:
+        json.dump(lock, f, indent=1)
+    return lock
+
+
+# ==============================================================================
+# EXÉCUTION (hors ligne)
+# ==============================================================================
+
+def read_lock():
+    try:
+        with open(LOCK_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def verify(names=None, full=False):
+    """
+    Vérifie les artefacts du magasin : présence et taille de chaque fichier,
+    et sha256 complet si `full`. Lève ModelStoreError au premier problème.
+    """
+    lock = read_lock()
+    if lock is None:
+        raise ModelStoreError(
+            f"Magasin de modèles absent ({LOCK_PATH}). "
+            "Lancez `python -m scripts.model_store prefetch` (étape du Dockerfile)."
+        )
+    for name in names or lock:
+        entry = lock.get(name)
+        if entry is None:
+            raise ModelStoreError(f"Modèle « {name} » absent du magasin {MODEL_STORE_DIR}.")
+        for rel, meta in entry["files"].items():
+            path = _model_dir(name) / rel
+            if not path.is_file() or path.stat().st_size != meta["size"]:
+                raise ModelStoreError(f"Artefact manquant ou tronqué : {path}")
+            if full and _sha256(path) != meta["sha256"]:
+                raise ModelStoreError(f"Checksum invalide : {path}")
+    return True
+
+
+_activated = False
+
+
+def activate_offline():
+    """Interdit tout téléchargement (HF, TF Hub) dans ce processus."""
+    global _activated
+    if _activated:
+        return
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    os.environ["TFHUB_CACHE_DIR"] = str(MODEL_STORE_DIR / ".tfhub_cache")
+    _activated = True
+
+
+def model_source(name, default):
+    """
+    Chemin local du modèle `name` en mode hors ligne (vérifié), sinon `default`
+    (identifiant distant, comportement historique).
+    """
+    if not MODEL_STORE_OFFLINE:
+        return default
+    activate_offline()
+    verify([name])
+    return str(_model_dir(name))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Magasin de modèles hors ligne")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("prefetch", help="Télécharger les modèles du manifeste")
+    p.add_argument("names", nargs="*")
+    v = sub.add_parser("verify", help="Vérifier les artefacts du magasin")
+    v.add_argument("names", nargs="*")
+    v.add_argument("--full", action="store_true", help="Recalculer tous les sha256")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "prefetch":
+            prefetch(args.names or None)
+        else:
+            verify(args.names or None, full=args.full)
+            print("✔ Magasin de modèles valide")
+    except ModelStoreError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,316 @@
+import gc
+import os
+import threading
+import time
+import weakref
+
+# ==============================================================================
+# REGISTRE DE MODÈLES PARESSEUX
+# ==============================================================================
+# Chaque modèle n'est chargé qu'au premier get() qui le demande. Le registre
+# mesure la mémoire résidente prise par chaque chargement, peut respecter un
+# budget mémoire (en déchargeant les modèles les moins récemment utilisés) et
+# décharger les modèles inactifs depuis trop longtemps : à chaque get(), et
+# par un thread de ménage périodique, pour rendre la mémoire même quand
+# l'application ne reçoit plus aucune requête.
+
+USE_MODEL_URL = "https://tfhub.dev/google/universal-sentence-encoder-large/5"
+ZERO_SHOT_MODEL_ID = "facebook/bart-large-mnli"
+
+# Budget mémoire total des modèles (Mo, 0 = illimité) et délai d'inactivité (s, 0 = jamais)
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+MODEL_IDLE_TIMEOUT_S = float(os.getenv("MODEL_IDLE_TIMEOUT_S", "0"))
+# Période du thread de ménage des modèles inactifs (0 = seulement lors des get())
+MODEL_REAPER_INTERVAL_S = float(os.getenv("MODEL_REAPER_INTERVAL_S", "60"))
+
+# Backend du modèle zero-shot : "pytorch" (pipeline transformers) ou "onnx" (ONNX Runtime int8)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch").lower()
+
+# Version du classifieur de clarté distillé (vide = la plus récente)
+CLARITY_MODEL_VERSION = os.getenv("CLARITY_MODEL_VERSION") or None
+
+# Poids PyTorch projetés en mémoire depuis les .safetensors du magasin local
+# (pages partagées entre processus via le cache de pages au lieu d'être copiées)
+MODEL_MMAP_WEIGHTS = os.getenv("MODEL_MMAP_WEIGHTS", "0") in ("1", "true", "yes")
+
+
+def model_fingerprint(name):
+    """(identifiant, version) d'un modèle, utilisés pour les clés de cache."""
+    if name == "use":
+        return USE_MODEL_URL, "tfhub"
+    if name == "zero_shot":
+        return ZERO_SHOT_MODEL_ID, INFERENCE_BACKEND
+    if name == "clarity_distilled":
+        return "clarity-distilled", CLARITY_MODEL_VERSION or "latest"
+    return name, ""
+
+
+def _current_rss_mb():
+    """Mémoire résidente du processus en Mo (0.0 si /proc indisponible)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+# Si défini, les modèles sont servis par scripts/model_server.py (mode client)
+MODEL_SERVER_URL = os.getenv("MODEL_SERVER_URL", "")
+
+
+def _model_server_client():
+    from scripts.model_server import ModelServerClient
+    return ModelServerClient(MODEL_SERVER_URL)
+
+
+# --- Fonctions de chargement (imports lourds faits seulement ici) ---
+def _load_use_local():
+    from scripts.model_store import model_source
+    source = model_source("use", USE_MODEL_URL)
+    from scripts.inference import GatedModel, configure_tensorflow_threads
+    configure_tensorflow_threads()
+    import tensorflow_hub as hub
+    from scripts.batching import with_micro_batching
+    return with_micro_batching("use", GatedModel("use", hub.load(source)))
+
+def _load_use():
+    if MODEL_SERVER_URL:
+        from scripts.model_server import RemoteUseModel
+        return RemoteUseModel(_model_server_client())
+    from scripts.framework_workers import FRAMEWORK_ISOLATION
+    if FRAMEWORK_ISOLATION:
+        from scripts.batching import with_micro_batching
+        from scripts.framework_workers import SubprocessUseModel
+        return with_micro_batching("use", SubprocessUseModel())
+    return _load_use_local()
+
+def _load_zero_shot_pipeline():
+    # Le magasin hors ligne est activé avant l'import de transformers (variables HF_*)
+    from scripts.model_store import model_source
+    source = model_source("zero_shot", ZERO_SHOT_MODEL_ID)
+    from scripts.inference import configure_torch_threads
+    configure_torch_threads()
+    import torch
+    from transformers import pipeline
+    device = 0 if torch.cuda.is_available() else -1
+    pipe = pipeline("zero-shot-classification", model=source, device=device)
+    if MODEL_MMAP_WEIGHTS and device == -1:
+        mmap_safetensors_weights(pipe.model, source)
+    return pipe
+
+def mmap_safetensors_weights(model, model_dir):
+    """
+    Remplace les poids de `model` par des tenseurs projetés depuis les fichiers
+    .safetensors de `model_dir` (copy-on-write, partagés entre les processus).
+    Sans effet si le modèle n'est pas un dossier local au format safetensors.
+    Retourne le nombre de tenseurs projetés.
+    """
+    from pathlib import Path
+
+    files = sorted(Path(model_dir).glob("*.safetensors")) if os.path.isdir(model_dir) else []
+    if not files:
+        return 0
+    from safetensors import safe_open
+
+    state = {}
+    for path in files:
+        with safe_open(str(path), framework="pt", device="cpu") as f:
+            for key in f.keys():
+                state[key] = f.get_tensor(key)
+    try:
+        # assign=True : les paramètres pointent sur les tenseurs projetés (torch >= 2.1)
+        model.load_state_dict(state, strict=False, assign=True)
+    except TypeError:
+        print("⚠️ torch trop ancien pour load_state_dict(assign=True) : poids non projetés")
+        return 0
+    if hasattr(model, "tie_weights"):
+        model.tie_weights()
+    return len(state)
+
+def _load_zero_shot_local():
+    from scripts.batching import with_micro_batching
+    from scripts.inference import GatedModel
+    if INFERENCE_BACKEND == "onnx":
+        from scripts.onnx_backend import load_zero_shot_onnx
+        model = load_zero_shot_onnx()
+    else:
+        model = _load_zero_shot_pipeline()
+    return with_micro_batching("zero_shot", GatedModel("zero_shot", model))
+
+def _load_zero_shot():
+    if MODEL_SERVER_URL:
+        from scripts.model_server import RemoteZeroShot
+        return RemoteZeroShot(_model_server_client())
+    from scripts.framework_workers import FRAMEWORK_ISOLATION
+    if FRAMEWORK_ISOLATION:
+        from scripts.batching import with_micro_batching
+        from scripts.framework_workers import SubprocessZeroShot
+        return with_micro_batching("zero_shot", SubprocessZeroShot())
+    return _load_zero_shot_local()
+
+def _load_clarity_distilled():
+    from scripts.clarity_distill import load_distilled_scorer
+    return load_distilled_scorer(CLARITY_MODEL_VERSION)
+
+
+# Chargeurs toujours locaux (serveur de modèles et sous-processus par framework)
+LOCAL_LOADERS = {
+    "use": _load_use_local,
+    "zero_shot": _load_zero_shot_local,
+}
+
+DEFAULT_LOADERS = {
+    "use": _load_use,
+    "zero_shot": _load_zero_shot,
+    "clarity_distilled": _load_clarity_distilled,
+}
+
+
+# Registre préchargé du processus : rempli par scripts/launcher.py avant de
+# forker les processus de l'application (pages partagées en copy-on-write),
+# ou par le préchauffage en arrière-plan de scripts/warmup.py.
+_shared_registry = None
+
+
+def set_shared_registry(registry):
+    global _shared_registry
+    _shared_registry = registry
+
+
+def shared_registry():
+    """Registre préchargé (lanceur ou préchauffage), ou None."""
+    return _shared_registry
+
+
+def _reaper_loop(registry_ref, interval_s):
+    # Référence faible : le thread ne garde pas en vie un registre abandonné
+    while True:
+        time.sleep(interval_s)
+        registry = registry_ref()
+        if registry is None:
+            return
+        try:
+            unloaded = registry.unload_idle(registry.idle_timeout_s) if registry.idle_timeout_s else []
+        except Exception as e:
+            print(f"⚠️ Ménage des modèles inactifs impossible : {e}")
+        else:
+            if unloaded:
+                print(f"💤 Modèles inactifs déchargés : {', '.join(unloaded)}")
+        del registry
+
+
+class ModelRegistry:
+    """Charge, mesure et décharge les modèles à la demande (thread-safe)."""
+
+    def __init__(self, loaders=None, memory_budget_mb=MODEL_MEMORY_BUDGET_MB,
+                 idle_timeout_s=MODEL_IDLE_TIMEOUT_S):
+        self._loaders = dict(DEFAULT_LOADERS if loaders is None else loaders)
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_timeout_s = idle_timeout_s
+        self._models = {}
+        self._rss_mb = {}
+        self._last_used = {}
+        self._load_seconds = {}
+        self._lock = threading.RLock()
+        self._name_locks = {name: threading.Lock() for name in self._loaders}
+        self._reaper_pid = None  # processus où tourne le thread de ménage
+
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self._name_locks.setdefault(name, threading.Lock())
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get(self, name):
+        """Retourne le modèle `name`, en le chargeant au premier appel."""
+        if name not in self._loaders:
+            raise KeyError(f"Modèle inconnu : {name}")
+
+        if self.idle_timeout_s:
+            self.unload_idle(self.idle_timeout_s, keep=(name,))
+
+        # Un verrou par modèle : deux sessions ne chargent pas deux fois le même
+        with self._name_locks[name]:
+            if name not in self._models:
+                before = _current_rss_mb()
+                start = time.perf_counter()
+                model = self._loaders[name]()
+                with self._lock:
+                    self._models[name] = model
+                    self._load_seconds[name] = time.perf_counter() - start
+                    self._rss_mb[name] = max(0.0, _current_rss_mb() - before)
+                self._enforce_budget(keep=(name,))
+            self._last_used[name] = time.monotonic()
+            if self._reaper_pid != os.getpid():
+                self.start_reaper()
+            return self._models[name]
+
+    def start_reaper(self, interval_s=MODEL_REAPER_INTERVAL_S):
+        """
+        Démarre (une fois par processus, y compris après un fork) le thread qui
+        décharge les modèles inactifs depuis plus de idle_timeout_s.
+        """
+        if not self.idle_timeout_s or interval_s <= 0:
+            return
+        with self._lock:
+            if self._reaper_pid == os.getpid():
+                return
+            self._reaper_pid = os.getpid()
+        threading.Thread(target=_reaper_loop,
+                         args=(weakref.ref(self), min(interval_s, self.idle_timeout_s)),
+                         name="model-reaper", daemon=True).start()
+
+    def unload(self, name):
+        """Libère un modèle chargé (il sera rechargé au prochain get())."""
+        with self._lock:
+            model = self._models.pop(name, None)
+            self._rss_mb.pop(name, None)
+            self._last_used.pop(name, None)
+        if model is not None:
+            # Seule la référence du registre est lâchée : une session en cours
+            # d'appel garde l'enveloppe, dont le micro-batcher s'arrête (finalize)
+            # quand le dernier appelant la relâche
+            del model
+            gc.collect()
+            return True
+        return False
+
+    def unload_idle(self, max_idle_s, keep=()):
+        """Décharge les modèles inutilisés depuis plus de `max_idle_s` secondes."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [n for n, t in self._last_used.items()
+                    if n not in keep and now - t > max_idle_s]
+        return [n for n in idle if self.unload(n)]
+
+    def _enforce_budget(self, keep=()):
+        if not self.memory_budget_mb:
+            return
+        while self.total_rss_mb() > self.memory_budget_mb:
+            with self._lock:
+                candidates = sorted(
+                    (t, n) for n, t in self._last_used.items() if n not in keep
+                )
+            if not candidates:
+                break
+            self.unload(candidates[0][1])
+
+    def total_rss_mb(self):
+        return sum(self._rss_mb.values())
+
+    def memory_report(self):
+        """État de chaque modèle : chargé ou non, mémoire résidente, temps de chargement."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "loaded": name in self._models,
+                    "rss_mb": round(self._rss_mb.get(name, 0.0), 1),
+                    "load_seconds": round(self._load_seconds.get(name, 0.0), 2),
+                    "idle_seconds": round(now - self._last_used[name], 1) if name in self._last_used else None,
+                }
+                for name in self._loaders
+            }
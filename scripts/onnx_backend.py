@@ -0,0 +1,139 @@
+import argparse
+
+from scripts.paths import MODELS_DIR
+
+# ==============================================================================
+# BACKEND ONNX RUNTIME (int8) POUR LE SCORE DE CLARTÉ
+# ==============================================================================
+# Dépendances optionnelles : `pip install optimum[onnxruntime]`.
+# Le modèle zero-shot (BART-large-MNLI) est exporté une fois en ONNX, quantifié
+# dynamiquement en int8, puis exécuté par ONNX Runtime sur CPU derrière la même
+# interface que pipeline(...).
+#
+# L'encodeur USE reste sur TensorFlow : son graphe TF Hub prend des chaînes brutes
+# et tokenise en interne avec des opérations que tf2onnx ne sait pas convertir.
+#
+# Usage :
+#   python -m scripts.onnx_backend export
+#   python -m scripts.onnx_backend parity documents/*.pdf
+
+ONNX_DIR = MODELS_DIR / "onnx"
+ZERO_SHOT_ONNX_DIR = ONNX_DIR / "bart-large-mnli"
+QUANTIZED_FILE_NAME = "model_quantized.onnx"
+
+
+def _require_optimum():
+    try:
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "Backend ONNX indisponible : installez `optimum[onnxruntime]` "
+            "ou repassez INFERENCE_BACKEND=pytorch."
+        ) from e
+
+
+def export_zero_shot_onnx(model_id=None, output_dir=ZERO_SHOT_ONNX_DIR, quantize=True):
+    """Exporte le modèle zero-shot en ONNX (fp32) puis en int8 dynamique."""
+    _require_optimum()
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    from scripts.model_store import model_source
+    from scripts.models import ZERO_SHOT_MODEL_ID
+    model_id = model_id or model_source("zero_shot", ZERO_SHOT_MODEL_ID)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model = ORTModelForSequenceClassification.from_pretrained(model_id, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(output_dir)
+
+    if quantize:
+        # Quantification dynamique : poids en int8, activations quantifiées à la volée
+        quantizer = ORTQuantizer.from_pretrained(output_dir)
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+    return output_dir
+
+
+def load_zero_shot_onnx(model_dir=ZERO_SHOT_ONNX_DIR, quantized=True):
+    """Pipeline zero-shot servi par ONNX Runtime (export automatique au premier appel)."""
+    _require_optimum()
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer, pipeline
+
+    from scripts.inference import TORCH_INTER_OP_THREADS, thread_split
+
+    file_name = QUANTIZED_FILE_NAME if quantized else "model.onnx"
+    if not (model_dir / file_name).exists():
+        export_zero_shot_onnx(output_dir=model_dir, quantize=quantized)
+
+    # ONNX Runtime remplace PyTorch : il reçoit la même part des cœurs
+    session_options = onnxruntime.SessionOptions()
+    session_options.intra_op_num_threads = thread_split()[1]
+    session_options.inter_op_num_threads = TORCH_INTER_OP_THREADS
+    model = ORTModelForSequenceClassification.from_pretrained(
+        model_dir, file_name=file_name, session_options=session_options
+    )
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+
+# ==============================================================================
+# CONTRÔLE DE PARITÉ fp32 / int8
+# ==============================================================================
+
+def clarity_parity(sentences_by_question, reference_zero_shot, candidate_zero_shot):
+    """
+    Compare le score de clarté par question entre deux backends.
+
+    Retourne {q_key: {'fp32', 'onnx', 'drift'}} ; drift = |onnx - fp32|.
+    """
+    from scripts.clarity import score_clarity_batch, clarity_average
+
+    reference = score_clarity_batch(sentences_by_question, reference_zero_shot)
+    candidate = score_clarity_batch(sentences_by_question, candidate_zero_shot)
+    report = {}
+    for q_key in sentences_by_question:
+        ref = clarity_average(reference[q_key])
+        cand = clarity_average(candidate[q_key])
+        report[q_key] = {"fp32": ref, "onnx": cand, "drift": abs(cand - ref)}
+    return report
+
+
+def _parity_main(pdf_paths):
+    from PyPDF2 import PdfReader
+
+    from scripts.grading import split_into_questions, split_into_sentences
+    from scripts.models import _load_zero_shot_pipeline
+
+    reference = _load_zero_shot_pipeline()
+    candidate = load_zero_shot_onnx()
+
+    worst = 0.0
+    for pdf_path in pdf_paths:
+        text = "".join(page.extract_text() or "" for page in PdfReader(pdf_path).pages)
+        sentences = {
+            q_key: split_into_sentences(q["text"]) for q_key, q in split_into_questions(text).items()
+        }
+        print(f"\n{pdf_path}")
+        for q_key, r in clarity_parity(sentences, reference, candidate).items():
+            worst = max(worst, r["drift"])
+            print(f"  {q_key:<5} fp32={r['fp32']:.4f}  onnx={r['onnx']:.4f}  écart={r['drift']:.4f}")
+    print(f"\nÉcart maximal de clarté par question : {worst:.4f} "
+          f"(impact max sur la note d'une question : {worst * 0.15:.2%} des points)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend ONNX Runtime du score de clarté")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("export", help="Exporter et quantifier le modèle zero-shot")
+    parity = sub.add_parser("parity", help="Comparer fp32 et int8 sur des PDF")
+    parity.add_argument("pdfs", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"Modèle exporté dans {export_zero_shot_onnx()}")
+    else:
+        _parity_main(args.pdfs)
@@ -0,0 +1,25 @@
+import os
+from pathlib import Path
+
+# ==============================================================================
+# CHEMINS PARTAGÉS (sans import lourd, utilisables par tous les modules)
+# ==============================================================================
+
+# Détermination de la racine du projet
+try:
+    APP_ROOT = Path(__file__).resolve().parent
+except NameError:
+    APP_ROOT = Path.cwd()
+
+# Si ce fichier est dans /scripts, on remonte d'un cran
+if APP_ROOT.name == "scripts":
+    APP_ROOT = APP_ROOT.parent
+
+# Dossier DATA (copies, caches, artefacts calculés)
+DATA_DIR = Path(os.getenv("DATA_DIR", APP_ROOT / "data"))
+
+# Corrigés disponibles
+DOCS_DIR = Path(os.getenv("DOCS_DIR", APP_ROOT / "documents"))
+
+# Artefacts de modèles (exports ONNX, classifieurs distillés...)
+MODELS_DIR = Path(os.getenv("MODELS_DIR", APP_ROOT / "models"))
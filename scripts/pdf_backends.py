@@ -0,0 +1,165 @@
+import io
+import os
+
+# ==============================================================================
+# MOTEURS D'EXTRACTION DE TEXTE PDF INTERCHANGEABLES
+# ==============================================================================
+# Même interface pour chaque bibliothèque : open() -> document, page_count(),
+# page_text(), close(). open() accepte un chemin ou le contenu du PDF (bytes). PyPDF2 (historique) et pdfplumber sont toujours
+# proposés ; PyMuPDF et pypdfium2, bien plus rapides, le sont s'ils sont
+# installés. PDF_BACKEND choisit le moteur utilisé par scripts/ingest.py.
+# Comparatif vitesse / mémoire / fidélité : python -m scripts.bench_pdf
+
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pypdf2").lower()
+
+
+def is_pdf_bytes(source):
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+class PdfBackend:
+    name = ""
+    module = ""
+
+    @classmethod
+    def available(cls):
+        try:
+            __import__(cls.module)
+            return True
+        except ImportError:
+            return False
+
+    def open(self, pdf_path):
+        raise NotImplementedError
+
+    def page_count(self, document):
+        raise NotImplementedError
+
+    def page_text(self, document, index):
+        raise NotImplementedError
+
+    def close(self, document):
+        pass
+
+    def extract_pages(self, pdf_path):
+        document = self.open(pdf_path)
+        try:
+            return [self.page_text(document, i) for i in range(self.page_count(document))]
+        finally:
+            self.close(document)
+
+
+class PyPDF2Backend(PdfBackend):
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def open(self, pdf_path):
+        from PyPDF2 import PdfReader
+        stream = io.BytesIO(pdf_path) if is_pdf_bytes(pdf_path) else open(pdf_path, "rb")
+        return PdfReader(stream)
+
+    def page_count(self, document):
+        return len(document.pages)
+
+    def page_text(self, document, index):
+        return document.pages[index].extract_text() or ""
+
+    def close(self, document):
+        document.stream.close()
+
+
+class PdfplumberBackend(PdfBackend):
+    name = "pdfplumber"
+    module = "pdfplumber"
+
+    def open(self, pdf_path):
+        import pdfplumber
+        return pdfplumber.open(io.BytesIO(pdf_path) if is_pdf_bytes(pdf_path) else pdf_path)
+
+    def page_count(self, document):
+        return len(document.pages)
+
+    def page_text(self, document, index):
+        page = document.pages[index]
+        text = page.extract_text() or ""
+        # Libère le cache d'objets de la page (sinon la mémoire croît avec le document)
+        page.close()
+        return text
+
+    def close(self, document):
+        document.close()
+
+
+class PyMuPDFBackend(PdfBackend):
+    name = "pymupdf"
+    module = "pymupdf"
+
+    @classmethod
+    def available(cls):
+        try:
+            import pymupdf  # noqa: F401
+        except ImportError:
+            try:
+                import fitz  # noqa: F401  (anciennes versions)
+            except ImportError:
+                return False
+        return True
+
+    def open(self, pdf_path):
+        try:
+            import pymupdf
+        except ImportError:
+            import fitz as pymupdf
+        if is_pdf_bytes(pdf_path):
+            return pymupdf.open(stream=bytes(pdf_path), filetype="pdf")
+        return pymupdf.open(pdf_path)
+
+    def page_count(self, document):
+        return document.page_count
+
+    def page_text(self, document, index):
+        return document.load_page(index).get_text()
+
+    def close(self, document):
+        document.close()
+
+
+class PdfiumBackend(PdfBackend):
+    name = "pypdfium2"
+    module = "pypdfium2"
+
+    def open(self, pdf_path):
+        import pypdfium2
+        return pypdfium2.PdfDocument(bytes(pdf_path) if is_pdf_bytes(pdf_path) else pdf_path)
+
+    def page_count(self, document):
+        return len(document)
+
+    def page_text(self, document, index):
+        page = document[index]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range()
+        finally:
+            textpage.close()
+            page.close()
+
+    def close(self, document):
+        document.close()
+
+
+BACKENDS = {b.name: b for b in (PyPDF2Backend, PdfplumberBackend, PyMuPDFBackend, PdfiumBackend)}
+
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+def get_backend(name=None):
+    """Instance du moteur `name` (PDF_BACKEND par défaut)."""
+    name = (name or PDF_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Moteur PDF inconnu : {name} (disponibles : {', '.join(BACKENDS)})")
+    if not BACKENDS[name].available():
+        raise RuntimeError(f"Moteur PDF « {name} » non installé (module {BACKENDS[name].module})")
+    return BACKENDS[name]()
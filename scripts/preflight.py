@@ -0,0 +1,147 @@
+import io
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from PyPDF2 import PdfReader
+
+from scripts.ingest import QUESTION_MARKER_PATTERN, ingest_pdf
+from scripts.pdf_backends import is_pdf_bytes
+
+# ==============================================================================
+# PRÉ-VÉRIFICATION RAPIDE D'UNE COPIE (AVANT TOUT CALCUL DE MODÈLE)
+# ==============================================================================
+# Dès le dépôt, on ne lit que la structure du PDF et ses PREFLIGHT_PAGES
+# premières pages : nombre de pages, chiffrement, présence d'une couche texte,
+# clés "Q1(5)" détectées avec leurs points, et écarts avec le corrigé choisi.
+# Un PDF scanné, chiffré ou sans question est refusé en quelques millisecondes,
+# au lieu d'échouer après le chargement des modèles et l'extraction complète.
+# La structure est lue avec PyPDF2 (seul moteur qui expose le chiffrement),
+# quel que soit PDF_BACKEND.
+
+PREFLIGHT_PAGES = int(os.getenv("PREFLIGHT_PAGES", "3"))
+# En dessous de ce nombre de caractères sur les pages lues : pas de couche texte
+PREFLIGHT_MIN_TEXT_CHARS = int(os.getenv("PREFLIGHT_MIN_TEXT_CHARS", "20"))
+
+
+@dataclass
+class PreflightReport:
+    page_count: int = 0
+    pages_read: int = 0
+    encrypted: bool = False
+    has_text_layer: bool = False
+    keys: Dict[str, int] = field(default_factory=dict)  # {"Q1": 5}
+    errors: List[str] = field(default_factory=list)     # bloquants
+    warnings: List[str] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    @property
+    def complete(self):
+        """Toutes les pages ont été lues (les clés détectées sont exhaustives)."""
+        return self.pages_read >= self.page_count
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def preflight_pdf(source, max_pages=PREFLIGHT_PAGES):
+    """Pré-vérification d'un PDF (chemin ou contenu en bytes)."""
+    start = time.perf_counter()
+    report = PreflightReport()
+    stream = None
+    try:
+        stream = io.BytesIO(source) if is_pdf_bytes(source) else open(source, "rb")
+        reader = PdfReader(stream)
+        if reader.is_encrypted:
+            report.encrypted = True
+            # Chiffré sans mot de passe d'ouverture : lisible quand même
+            if not reader.decrypt(""):
+                report.errors.append("PDF protégé par mot de passe : impossible de le lire.")
+                return report
+        report.page_count = len(reader.pages)
+        if report.page_count == 0:
+            report.errors.append("Le PDF ne contient aucune page.")
+            return report
+
+        text = "".join(reader.pages[i].extract_text() or ""
+                       for i in range(min(max_pages, report.page_count)))
+        report.pages_read = min(max_pages, report.page_count)
+    except Exception as e:
+        report.errors.append(f"PDF illisible : {type(e).__name__}: {e}")
+        return report
+    finally:
+        if stream is not None:
+            stream.close()
+        report.elapsed_ms = 1000 * (time.perf_counter() - start)
+
+    report.has_text_layer = len(text.strip()) >= PREFLIGHT_MIN_TEXT_CHARS
+    if not report.has_text_layer:
+        if report.complete:
+            report.errors.append("Aucun texte détecté : PDF scanné ou image ? Exportez votre devoir en PDF texte.")
+        else:
+            # Page de garde scannée ou vierge : le reste du document peut avoir du texte
+            report.warnings.append(
+                f"Aucun texte détecté sur les {report.pages_read} premières pages (page de garde scannée ?).")
+        return report
+
+    for m in QUESTION_MARKER_PATTERN.finditer(text):
+        if m.group(2) is not None:
+            report.keys.setdefault(f"Q{m.group(1)}", int(m.group(2)))
+    if not report.keys:
+        message = "Aucune question au format Q1(5) détectée"
+        if report.complete:
+            report.errors.append(f"{message}.")
+        else:
+            report.warnings.append(f"{message} sur les {report.pages_read} premières pages.")
+    return report
+
+
+def corrige_keys(prof_source):
+    """{clé: points} du corrigé (lecture complète mise en cache, les corrigés sont courts)."""
+    document = ingest_pdf(prof_source)
+    if document.error:
+        return None
+    return {key: q["points"] for key, q in document.questions().items()}
+
+
+def check_against_corrige(report, prof_keys):
+    """Ajoute au rapport les écarts entre les clés de la copie et celles du corrigé."""
+    if not report.ok or not report.keys or prof_keys is None:
+        return report
+    extra = [k for k in report.keys if k not in prof_keys]
+    differing = [k for k in report.keys if k in prof_keys and report.keys[k] != prof_keys[k]]
+    missing = [k for k in prof_keys if k not in report.keys]
+
+    shared = len(report.keys) - len(extra)
+    scale = ", ".join(f"{k} ({report.keys[k]} au lieu de {prof_keys[k]})" for k in differing)
+
+    if shared == 0:
+        report.errors.append(
+            f"Aucune question de la copie ({', '.join(extra)}) ne correspond au corrigé "
+            f"({', '.join(prof_keys)}) : vérifiez le corrigé choisi."
+        )
+        return report
+    # Copie d'un autre devoir : mêmes numéros de questions, mais barème différent
+    # partout, ou barème différent en plus de questions qui ne se recoupent pas
+    if differing and (len(differing) == shared or extra or (missing and report.complete)):
+        report.errors.append(
+            f"Barème de la copie incompatible avec le corrigé ({scale}) : vérifiez le corrigé choisi."
+        )
+        return report
+    if extra:
+        report.warnings.append(f"Questions absentes du corrigé (ignorées) : {', '.join(extra)}")
+    if differing:
+        report.warnings.append(f"Barème différent du corrigé (celui du corrigé s'applique) : {scale}")
+    if missing and report.complete:
+        report.warnings.append(f"Questions sans réponse détectée (notées 0) : {', '.join(missing)}")
+    return report
+
+
+def preflight_submission(student_source, prof_source=None, max_pages=PREFLIGHT_PAGES):
+    """Pré-vérification de la copie, comparée au corrigé s'il est déjà choisi."""
+    report = preflight_pdf(student_source, max_pages)
+    if prof_source is not None:
+        check_against_corrige(report, corrige_keys(prof_source))
+    return report
@@ -0,0 +1,88 @@
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import List, Tuple
+
+# ==============================================================================
+# PRÉTRAITEMENT D'UNE RÉPONSE (UNE SEULE FOIS PAR QUESTION)
+# ==============================================================================
+# Tout le travail sur la chaîne d'une réponse (découpage en phrases avec leurs
+# positions, minuscules, texte sans accents, mots et frontières de mots) est
+# fait une fois dans un PreparedAnswer, puis partagé par les étapes de la
+# notation : similarité et cohérence (texte et phrases à encoder), clarté
+# (phrases) et lexiques (texte normalisé et frontières de mots, voir
+# scripts/lexicon.py). Les formes normalisées gardent la longueur du texte :
+# une position y désigne le même caractère que dans le texte d'origine.
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+_WORD = re.compile(r"\w+")
+
+_fold_table = {}
+
+
+def lower_same_length(text):
+    """Minuscules sans changer les positions (quelques caractères, comme 'İ', s'allongent)."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def fold_accents(text):
+    """Retire les accents caractère par caractère ('é' -> 'e'), sans changer la longueur."""
+    missing = {ord(c) for c in set(text) if ord(c) > 127 and ord(c) not in _fold_table}
+    for code in missing:
+        # Forme décomposée : lettre de base puis accents combinants
+        _fold_table[code] = unicodedata.normalize("NFD", chr(code))[0]
+    return text.translate(_fold_table)
+
+
+def sentence_spans(text):
+    """Positions (début, fin) des phrases, découpées comme split_into_sentences."""
+    spans = []
+    start = 0
+    for m in list(_SENTENCE_BREAK.finditer(text)) + [None]:
+        end = m.start() if m else len(text)
+        piece = text[start:end]
+        left = len(piece) - len(piece.lstrip())
+        right = len(piece.rstrip())
+        if right > left:
+            spans.append((start + left, start + right))
+        if m:
+            start = m.end()
+    return spans
+
+
+@dataclass
+class PreparedAnswer:
+    text: str
+    sentence_spans: List[Tuple[int, int]] = field(default_factory=list)
+    lowered: str = ""                 # minuscules, même longueur que text
+    folded: str = ""                  # minuscules sans accents, même longueur que text
+    word_spans: List[Tuple[int, int]] = field(default_factory=list)
+
+    @cached_property
+    def sentences(self):
+        return [self.text[s:e] for s, e in self.sentence_spans]
+
+    @property
+    def token_count(self):
+        return len(self.word_spans)
+
+    @cached_property
+    def boundaries(self):
+        """Frontières de mots (positions où \\b correspond)."""
+        return {p for span in self.word_spans for p in span}
+
+
+def prepare_answer(text):
+    """Prétraitement unique d'une réponse (ou d'une question du corrigé)."""
+    lowered = lower_same_length(text)
+    return PreparedAnswer(
+        text=text,
+        sentence_spans=sentence_spans(text),
+        lowered=lowered,
+        folded=fold_accents(lowered),
+        word_spans=[m.span() for m in _WORD.finditer(lowered)],
+    )
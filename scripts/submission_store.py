@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from scripts.paths import DATA_DIR
+
+# ==============================================================================
+# MAGASIN DE COPIES ET DE CORRIGÉS ADRESSÉ PAR CONTENU
+# ==============================================================================
+# Chaque PDF (copie déposée, corrigé choisi ou déposé) est rangé une seule fois
+# sous objects/<sha[:2]>/<sha>.pdf, en lecture seule : un même corrigé choisi
+# par 200 étudiants n'existe qu'en un exemplaire. Les corrigés de documents/
+# sont copiés (pas liés) : un fichier de documents/ modifié sur place ne
+# change jamais un objet déjà rangé sous son ancien sha256.
+# La dernière utilisation d'un objet est notée dans un fichier <sha>.seen à
+# côté de lui (jamais par utime sur l'objet, partagé par liens physiques avec
+# les runs).
+# Chaque notation reçoit son propre dossier runs/<id>/ avec des liens physiques
+# vers ses entrées : deux onglets d'un même utilisateur ne s'écrasent plus, et
+# un job en file d'attente lit toujours les fichiers qu'on lui a donnés.
+# Un thread de ménage supprime les runs plus vieux que STORE_TTL_S, les objets
+# qui ne sont plus référencés, puis (si DATA_DIR dépasse DATA_QUOTA_MB) les
+# plus anciens objets non référencés et les fichiers du cache d'embeddings.
+
+STORE_DIR = Path(os.getenv("SUBMISSION_STORE_DIR", DATA_DIR / "store"))
+OBJECTS_DIR = STORE_DIR / "objects"
+RUNS_DIR = STORE_DIR / "runs"
+STAGING_DIR = STORE_DIR / "staging"
+STORE_TTL_S = float(os.getenv("STORE_TTL_S", str(24 * 3600)))
+DATA_QUOTA_MB = float(os.getenv("DATA_QUOTA_MB", "2048"))
+STORE_GC_INTERVAL_S = float(os.getenv("STORE_GC_INTERVAL_S", "600"))
+# Un dépôt récent (pas encore noté) n'est jamais supprimé pour le quota
+STORE_MIN_AGE_S = float(os.getenv("STORE_MIN_AGE_S", "3600"))
+
+
+def object_path(sha256):
+    return OBJECTS_DIR / sha256[:2] / f"{sha256}.pdf"
+
+
+def staging_path():
+    """Chemin temporaire où écrire un upload avant de l'adopter dans le magasin."""
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    return STAGING_DIR / f"{uuid.uuid4().hex}.pdf"
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _seen_path(sha256):
+    return OBJECTS_DIR / sha256[:2] / f"{sha256}.seen"
+
+
+def _mark_seen(sha256):
+    """Note l'utilisation d'un objet, pour le ménage (TTL)."""
+    seen = _seen_path(sha256)
+    seen.parent.mkdir(parents=True, exist_ok=True)
+    seen.touch()
+
+
+def _last_seen(path, st):
+    """Date de dernière utilisation d'un objet (son .seen, sinon sa date d'écriture)."""
+    try:
+        return max(st.st_mtime, path.with_suffix(".seen").stat().st_mtime)
+    except OSError:
+        return st.st_mtime
+
+
+def _install(src, sha256, move):
+    """Range `src` sous son objet (déplacé ou copié). Retourne le chemin de l'objet."""
+    target = object_path(sha256)
+    if target.exists():
+        if move:
+            os.unlink(src)
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if move:
+            os.replace(src, target)
+        else:
+            # Copie unique, écrite atomiquement
+            fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".part")
+            os.close(fd)
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, target)
+        os.chmod(target, 0o444)
+    _mark_seen(sha256)
+    return target
+
+
+def adopt_upload(upload):
+    """
+    Range un StoredUpload écrit dans staging_path() (son sha256 est déjà connu)
+    et le fait pointer sur l'objet du magasin.
+    """
+    upload.path = _install(upload.path, upload.sha256, move=True)
+    return upload
+
+
+_known_files = {}
+_known_files_lock = threading.Lock()
+
+
+def put_file(path):
+    """Range un fichier existant (corrigé de documents/...) et retourne son sha256."""
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    with _known_files_lock:
+        sha256 = _known_files.get(key)
+    if sha256 is None:
+        sha256 = _file_sha256(path)
+        with _known_files_lock:
+            _known_files[key] = sha256
+    _install(path, sha256, move=False)
+    return sha256
+
+
+def create_run(student_sha256, prof_sha256):
+    """
+    Dossier propre à une notation, avec ses entrées figées (liens physiques).
+    Retourne (dossier, chemin copie, chemin corrigé).
+    """
+    run_dir = RUNS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    run_dir.mkdir(parents=True)
+    student = run_dir / "Etudiant.pdf"
+    prof = run_dir / "prof.pdf"
+    os.link(object_path(student_sha256), student)
+    os.link(object_path(prof_sha256), prof)
+    with open(run_dir / "run.json", "w", encoding="utf-8") as f:
+        json.dump({"student": student_sha256, "prof": prof_sha256, "created": time.time()}, f)
+    return run_dir, student, prof
+
+
+# ==============================================================================
+# MÉNAGE (TTL + QUOTA)
+# ==============================================================================
+
+def _tree_size(root):
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            # Un fichier à plusieurs liens physiques n'occupe le disque qu'une fois
+            total += st.st_size / max(1, st.st_nlink)
+    return total
+
+
+def _remove_run(run_dir):
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def _unreferenced_objects():
+    """
+    (dernière utilisation, chemin, taille) des objets qu'aucun run ne
+    référence (un seul lien physique).
+    """
+    objects = []
+    for path in OBJECTS_DIR.glob("*/*.pdf"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if st.st_nlink == 1:
+            objects.append((_last_seen(path, st), path, st.st_size))
+    return sorted(objects)
+
+
+def _remove_object(path):
+    path.unlink(missing_ok=True)
+    path.with_suffix(".seen").unlink(missing_ok=True)
+
+
+def collect_garbage(ttl_s=STORE_TTL_S, quota_mb=DATA_QUOTA_MB, data_dir=DATA_DIR):
+    """Une passe de ménage. Retourne le nombre de fichiers/dossiers supprimés par catégorie."""
+    now = time.time()
+    removed = {"runs": 0, "objects": 0, "staging": 0, "cache": 0}
+
+    for run_dir in RUNS_DIR.glob("*") if RUNS_DIR.exists() else []:
+        if now - run_dir.stat().st_mtime > ttl_s:
+            _remove_run(run_dir)
+            removed["runs"] += 1
+    for part in STAGING_DIR.glob("*") if STAGING_DIR.exists() else []:
+        # Upload interrompu
+        if now - part.stat().st_mtime > STORE_MIN_AGE_S:
+            part.unlink(missing_ok=True)
+            removed["staging"] += 1
+
+    unreferenced = []
+    for mtime, path, size in _unreferenced_objects() if OBJECTS_DIR.exists() else []:
+        if now - mtime > ttl_s:
+            _remove_object(path)
+            removed["objects"] += 1
+        else:
+            unreferenced.append((mtime, path, size))
+
+    if quota_mb:
+        excess = _tree_size(data_dir) - quota_mb * 1024 * 1024
+        # Quota dépassé : d'abord les objets non référencés les plus anciens...
+        for mtime, path, size in unreferenced:
+            if excess <= 0 or now - mtime < STORE_MIN_AGE_S:
+                break
+            _remove_object(path)
+            excess -= size
+            removed["objects"] += 1
+        # ... puis le cache disque des embeddings (recalculable)
+        if excess > 0:
+            from scripts.cache import MODEL_CACHE_DIR
+            cached = sorted((p.stat().st_atime, p) for p in Path(MODEL_CACHE_DIR).rglob("*.npy"))
+            for _, path in cached:
+                if excess <= 0:
+                    break
+                excess -= path.stat().st_size
+                path.unlink(missing_ok=True)
+                removed["cache"] += 1
+    return removed
+
+
+_collector = None
+_collector_lock = threading.Lock()
+
+
+def _collector_loop(interval_s):
+    while True:
+        try:
+            removed = collect_garbage()
+            if any(removed.values()):
+                print(f"🧹 Ménage du magasin : {removed}")
+        except Exception as e:
+            print(f"⚠️ Ménage du magasin impossible : {e}")
+        time.sleep(interval_s)
+
+
+def start_collector(interval_s=STORE_GC_INTERVAL_S):
+    """Démarre (une fois par processus) le thread de ménage."""
+    global _collector
+    with _collector_lock:
+        if _collector is None and interval_s > 0:
+            _collector = threading.Thread(target=_collector_loop, args=(interval_s,),
+                                          name="store-gc", daemon=True)
+            _collector.start()
+    return _collector
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+# ==============================================================================
+# ENREGISTREMENT DES UPLOADS PAR BLOCS
+# ==============================================================================
+# Les fichiers déposés sont recopiés sur disque par blocs de UPLOAD_CHUNK_BYTES
+# (écriture atomique : fichier temporaire puis rename), en calculant au passage
+# leur sha256 et une estimation du nombre de pages (objets /Type /Page).
+# Aucune copie du contenu n'est gardée dans la session : Streamlit garde déjà
+# le fichier déposé en mémoire (UploadedFile). Pour un petit fichier
+# (<= UPLOAD_IN_MEMORY_MAX_BYTES), la notation synchrone lit ce contenu au
+# moment de noter (upload_source), sans relire le disque ; sinon, le chemin.
+
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_IN_MEMORY_MAX_BYTES = int(os.getenv("UPLOAD_IN_MEMORY_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# "/Type /Page" (et non "/Type /Pages", le nœud de l'arbre des pages)
+_PAGE_OBJECT = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+# Recouvrement entre blocs pour ne pas manquer un motif coupé en deux
+_PAGE_OBJECT_OVERLAP = 32
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    name: str
+    sha256: str
+    size: int
+    is_pdf: bool                  # en-tête "%PDF-" présent
+    page_count_estimate: int      # objets page vus dans le flux (0 si compressés en object streams)
+
+
+def upload_source(upload, uploaded=None, in_memory_max_bytes=UPLOAD_IN_MEMORY_MAX_BYTES):
+    """
+    Ce que la notation doit lire : le contenu de `uploaded` (UploadedFile encore
+    en mémoire, lu au moment de noter) si le fichier est petit, sinon le chemin.
+    """
+    if (uploaded is not None and upload.size <= in_memory_max_bytes
+            and getattr(uploaded, "size", None) == upload.size):
+        return uploaded.getvalue()
+    return upload.path
+
+
+def save_upload(fileobj, dest_path, name=None, chunk_bytes=UPLOAD_CHUNK_BYTES):
+    """Copie `fileobj` (UploadedFile Streamlit ou tout flux binaire) vers `dest_path`."""
+    dest_path = Path(dest_path)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+
+    digest = hashlib.sha256()
+    size = pages = 0
+    head = tail = b""
+    fd, tmp = tempfile.mkstemp(dir=dest_path.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(chunk_bytes)
+                if not chunk:
+                    break
+                out.write(chunk)
+                digest.update(chunk)
+                if size < 8:
+                    head = (head + chunk)[:8]
+                window = tail + chunk
+                # Les motifs entièrement dans `tail` ont déjà été comptés
+                pages += sum(1 for m in _PAGE_OBJECT.finditer(window) if m.end() > len(tail))
+                tail = window[-_PAGE_OBJECT_OVERLAP:]
+                size += len(chunk)
+        os.replace(tmp, dest_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+    return StoredUpload(
+        path=dest_path,
+        name=name or getattr(fileobj, "name", dest_path.name),
+        sha256=digest.hexdigest(),
+        size=size,
+        is_pdf=head.startswith(b"%PDF-"),
+        page_count_estimate=pages,
+    )
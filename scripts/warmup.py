@@ -0,0 +1,220 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.paths import DATA_DIR
+
+# ==============================================================================
+# PRÉCHAUFFAGE DES MODÈLES AU DÉMARRAGE ET SIGNAL DE DISPONIBILITÉ
+# ==============================================================================
+# Sans préchauffage, le premier étudiant qui ouvre la page d'analyse déclenche
+# le chargement des modèles et attend derrière le spinner. Ici les modèles de
+# notation sont chargés dans un thread dès le démarrage du processus, puis
+# appelés une fois sur une phrase factice (traçage des graphes TF, init
+# paresseuse de torch). L'état est publié :
+#   - dans READINESS_FILE (JSON, écrit atomiquement) ;
+#   - sur GET /ready (200 si prêt, 503 sinon) et GET /health si WARMUP_HEALTH_PORT.
+#     /health ajoute les statistiques d'exécution du processus : caches des
+#     sorties de modèles, micro-batchers et ordonnancement des appels.
+# Le registre préchauffé devient le registre du processus (shared_registry()).
+# Avec GRADING_WORKERS > 0, la notation se fait dans les workers du pool
+# (scripts/jobs.py) : c'est ce pool qui est démarré et préchauffé (un job
+# factice par worker), et la disponibilité suit ses workers. Aucun modèle
+# n'est alors chargé dans le processus Streamlit.
+#
+# Démarrage : python -m scripts.warmup app.py --server.port=8080 ...
+#             (préchauffage en arrière-plan puis `streamlit run` dans le même processus)
+
+READINESS_FILE = os.getenv("READINESS_FILE", str(DATA_DIR / "ready.json"))
+WARMUP_HEALTH_PORT = int(os.getenv("WARMUP_HEALTH_PORT", "0"))
+WARMUP_SENTENCE = "La division du travail améliore la productivité de l'entreprise."
+
+LOADING, READY, FAILED = "loading", "ready", "failed"
+
+_state_lock = threading.Lock()
+_state = {"status": LOADING, "pid": os.getpid(), "started_at": None, "ready_at": None,
+          "error": None, "models": {}}
+_warmup_thread = None
+
+
+def readiness():
+    """Copie de l'état de préchauffage du processus."""
+    with _state_lock:
+        return json.loads(json.dumps(_state))
+
+
+def _update(**changes):
+    with _state_lock:
+        _state.update(changes)
+        snapshot = json.dumps(_state, ensure_ascii=False, indent=1)
+    _write_readiness_file(snapshot)
+
+
+def _update_model(name, **changes):
+    with _state_lock:
+        _state["models"].setdefault(name, {}).update(changes)
+    _update()
+
+
+def _write_readiness_file(content, path=READINESS_FILE):
+    if not path:
+        return
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _dummy_inference(name, model, registry):
+    if name == "use":
+        model([WARMUP_SENTENCE])
+    elif name == "zero_shot":
+        from scripts.clarity import CLARITY_LABELS
+        model([WARMUP_SENTENCE], CLARITY_LABELS, batch_size=len(CLARITY_LABELS))
+    elif name == "clarity_distilled":
+        from scripts.embedding import embed_texts
+        model.score_embeddings(embed_texts([WARMUP_SENTENCE], registry.get("use")))
+
+
+def warm_up(registry, names=None):
+    """Charge puis appelle une fois chaque modèle ; met à jour l'état de disponibilité."""
+    from scripts.grading import required_models
+
+    names = names or required_models()
+    _update(status=LOADING, started_at=time.time(),
+            models={name: {"state": "pending"} for name in names})
+    try:
+        for name in names:
+            _update_model(name, state=LOADING)
+            start = time.perf_counter()
+            model = registry.get(name)
+            loaded = time.perf_counter()
+            _dummy_inference(name, model, registry)
+            _update_model(name, state=READY,
+                          load_seconds=round(loaded - start, 2),
+                          warmup_seconds=round(time.perf_counter() - loaded, 2))
+    except Exception as e:
+        _update(status=FAILED, error=f"{type(e).__name__}: {e}")
+        traceback.print_exc()
+        return False
+    _update(status=READY, ready_at=time.time())
+    print(f"✔ Modèles prêts : {', '.join(names)}")
+    return True
+
+
+def warm_up_job_queue(queue):
+    """Préchauffe les workers du pool de notation ; la disponibilité suit leur nombre."""
+    from scripts.grading import required_models
+
+    names = required_models()
+    _update(status=LOADING, started_at=time.time(),
+            models={name: {"state": LOADING} for name in names},
+            workers={"ready": 0, "total": queue.workers, "pids": []})
+    start = time.perf_counter()
+    try:
+        queue.warm_up(on_progress=lambda pids: _update(
+            workers={"ready": len(pids), "total": queue.workers, "pids": pids}))
+    except Exception as e:
+        _update(status=FAILED, error=f"{type(e).__name__}: {e}")
+        traceback.print_exc()
+        return False
+    seconds = round(time.perf_counter() - start, 2)
+    _update(status=READY, ready_at=time.time(),
+            models={name: {"state": READY, "warmup_seconds": seconds} for name in names})
+    print(f"✔ {queue.workers} workers de notation prêts ({', '.join(names)})")
+    return True
+
+
+def start_background_warmup(names=None):
+    """
+    Lance le préchauffage dans un thread (une seule fois par processus).
+    Sans pool de notation, le registre préchauffé devient le registre du
+    processus ; avec GRADING_WORKERS > 0, c'est le pool qui est partagé.
+    Retourne le registre ou le pool.
+    """
+    global _warmup_thread
+    from scripts.jobs import GRADING_WORKERS, GradingJobQueue, set_shared_job_queue, shared_job_queue
+    from scripts.models import ModelRegistry, set_shared_registry, shared_registry
+
+    with _state_lock:
+        if GRADING_WORKERS > 0:
+            target = shared_job_queue()
+            if _warmup_thread is not None:
+                return target
+            if target is None:
+                target = GradingJobQueue(GRADING_WORKERS)
+                set_shared_job_queue(target)
+            _warmup_thread = threading.Thread(target=warm_up_job_queue, args=(target,),
+                                              name="model-warmup", daemon=True)
+        else:
+            target = shared_registry()
+            if _warmup_thread is not None:
+                return target
+            if target is None:
+                target = ModelRegistry()
+                set_shared_registry(target)
+            _warmup_thread = threading.Thread(target=warm_up, args=(target, names),
+                                              name="model-warmup", daemon=True)
+    # Écrase tout fichier de disponibilité laissé par un processus précédent
+    _update(status=LOADING, pid=os.getpid(), ready_at=None, error=None)
+    _warmup_thread.start()
+    return target
+
+
+# ==============================================================================
+# ENDPOINT DE SANTÉ
+# ==============================================================================
+
+def runtime_report():
+    """Caches, micro-batchers et ordonnancement des modèles du processus."""
+    from scripts.batching import batching_report
+    from scripts.cache import cache_report
+    from scripts.inference import scheduler_report
+
+    return {"caches": cache_report(), "batching": batching_report(), "scheduler": scheduler_report()}
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        state = readiness()
+        if self.path == "/ready":
+            status = 200 if state["status"] == READY else 503
+        elif self.path == "/health":
+            status = 500 if state["status"] == FAILED else 200
+            state.update(runtime_report())
+        else:
+            status, state = 404, {"error": "not found"}
+        body = json.dumps(state).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_health_server(port=WARMUP_HEALTH_PORT, host="0.0.0.0"):
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _HealthHandler)
+    threading.Thread(target=server.serve_forever, name="health-server", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    # Arguments transmis tels quels à `streamlit run`
+    start_health_server()
+    start_background_warmup()
+    from streamlit.web import cli as stcli
+
+    sys.argv = ["streamlit", "run", *sys.argv[1:]]
+    sys.exit(stcli.main())
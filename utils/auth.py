@@ -1,6 +1,6 @@
 # Fichier: utils/auth.py
-import firebase_admin
-from firebase_admin import credentials, auth
+# firebase_admin est importé dans les fonctions qui l'utilisent (import lent,
+# inutile pour la connexion qui passe par l'API REST)
 import requests
 import random
 import string
@@ -11,6 +11,9 @@ import os
 
 def initialize_firebase():
     """Initialise Firebase de manière compatible Cloud & Local."""
+    import firebase_admin
+    from firebase_admin import credentials
+
     if not firebase_admin._apps:
         # 1. Essayer via st.secrets (Pour Streamlit Cloud)
         if "firebase" in st.secrets:
@@ -56,6 +59,8 @@ def register_user(email, username):
     # -----------------------------------
 
     try:
+        from firebase_admin import auth
+
         password = generate_password()
         
         # Création Firebase